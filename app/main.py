@@ -1,35 +1,407 @@
 from __future__ import annotations
 
+import asyncio
+import collections
+import contextlib
+import dataclasses
 import datetime
+import functools
+import gzip
+import hashlib
 import json
+import math
+import mimetypes
 import os
+import shutil
+import string
 import tempfile
 import threading
 import time
 import uuid
-from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
-from fastapi import Body, FastAPI, File, HTTPException, Request, UploadFile
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import Body, FastAPI, HTTPException, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.datastructures import Headers
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 from cell_kml_generator import column_mapper, config, earfcn_utils, file_handler, geometry, kml_generator, validators
+from cell_kml_generator.cell_frame import PETAL_CACHE, CellFrame, build_cell_frame
+from cell_kml_generator.ingest_cache import IngestCache
 from cell_kml_generator.label_configurator import LabelConfig, build_label
+from cell_kml_generator.lru_cache import LRUCache
 
 APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 PROFILES_DIR = os.path.join(APP_ROOT, "profiles")
 
-app = FastAPI()
-app.mount("/static", StaticFiles(directory=os.path.join(APP_ROOT, "static")), name="static")
+# Responses above GZIP_MIN_BYTES are gzip-compressed for clients that accept it
+GZIP_MIN_BYTES = 4096
+GZIP_LEVEL = 5
+PRECOMPRESSED_SUFFIXES = (".js", ".css", ".html", ".svg", ".json")
+# KMZ is already a zip: "identity" makes GZipMiddleware pass it through untouched
+KMZ_MEDIA_TYPE = "application/vnd.google-earth.kmz"
+NO_GZIP_HEADERS = {"Content-Encoding": "identity"}
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        value = value.item()
+        if isinstance(value, float) and not math.isfinite(value):
+            return None
+        return value
+    if value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, (datetime.date, datetime.datetime, pd.Timestamp)):
+        return value.isoformat()
+    return str(value)
+
+
+def _finite(value: Any) -> Any:
+    """Copy of `value` with NaN/Infinity floats replaced by None (valid JSON)."""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    if isinstance(value, np.ndarray) and value.dtype.kind == "f":
+        return [_finite(item) for item in value.tolist()]
+    return value
+
+
+def dumps_json(content: Any) -> bytes:
+    """Serialize to compact JSON bytes with orjson when installed.
+
+    NumPy scalars/arrays are converted and NaN/Infinity become null, so pandas
+    values can be returned as-is.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    try:
+        text = json.dumps(content, default=_json_default, allow_nan=False, ensure_ascii=False, separators=(",", ":"))
+    except ValueError:
+        text = json.dumps(_finite(content), default=_json_default, ensure_ascii=False, separators=(",", ":"))
+    return text.encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with dumps_json.
+
+    Returning it directly from an endpoint also skips FastAPI's jsonable_encoder
+    pass, which dominates the cost of large payloads.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves text assets from gzip copies made once at startup."""
+
+    def __init__(self, *, directory: str, **kwargs: Any) -> None:
+        super().__init__(directory=directory, **kwargs)
+        self.gzipped: Dict[str, Tuple[bytes, str]] = {}
+        for root, _dirs, files in os.walk(directory):
+            for name in files:
+                if not name.endswith(PRECOMPRESSED_SUFFIXES):
+                    continue
+                full_path = os.path.join(root, name)
+                with open(full_path, "rb") as handle:
+                    content = handle.read()
+                etag = '"%s-gz"' % hashlib.md5(content).hexdigest()
+                rel_path = os.path.normpath(os.path.relpath(full_path, directory))
+                self.gzipped[rel_path] = (gzip.compress(content, compresslevel=9, mtime=0), etag)
+
+    async def get_response(self, path: str, scope: Any) -> Response:
+        entry = self.gzipped.get(path)
+        headers = Headers(scope=scope)
+        if entry is None or "gzip" not in headers.get("accept-encoding", ""):
+            return await super().get_response(path, scope)
+
+        body, etag = entry
+        response_headers = {"ETag": etag, "Vary": "Accept-Encoding", "Content-Encoding": "gzip"}
+        if headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=response_headers)
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        return Response(body, media_type=media_type, headers=response_headers)
+
+
+class RenderSuperseded(Exception):
+    """A map render was dropped because a newer configuration replaced the one it was for."""
+
+
+class RenderScheduler:
+    """Runs map renders one at a time and drops those a newer configuration superseded.
+
+    Every effective settings or data change calls `advance()`. A render keeps
+    the generation that was current when its request arrived and checks it
+    before and after waiting for the render slot and between row batches, so
+    queued and in-flight renders of an old configuration stop early. The slot
+    is awaited on the event loop: a queued render holds no worker thread.
+    """
+
+    def __init__(self) -> None:
+        self.generation = 0
+        self.superseded = 0
+        self._slot = asyncio.Lock()
+        self._guard = threading.Lock()
+
+    def advance(self) -> int:
+        with self._guard:
+            self.generation += 1
+            return self.generation
+
+    def check(self, generation: int) -> None:
+        if generation != self.generation:
+            with self._guard:
+                self.superseded += 1
+            raise RenderSuperseded()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, generation: int) -> AsyncIterator[None]:
+        """Hold the render slot (waiting for the render in progress), failing if superseded."""
+        self.check(generation)
+        async with self._slot:
+            self.check(generation)
+            yield
+
+    def stats(self) -> Dict[str, int]:
+        return {"generation": self.generation, "superseded": self.superseded}
+
+
+class LiveChannel:
+    """Sector changes pushed to Live mode clients by /api/live/events.
+
+    Every effective settings or data change is published as the diff between
+    the sector snapshot of the previous generation and the new one: removed
+    and added row ids, and the columns of the rows added or changed.
+    Snapshots are only built while a client is subscribed; a client whose
+    generation is not covered by the last `history` diffs must reload.
+    """
+
+    def __init__(self, history: int, columns: Tuple[str, ...]) -> None:
+        self.columns = columns
+        self.version = 0
+        self.subscribers = 0
+        self.snapshot: Optional[Dict[str, Any]] = None
+        self.diffs: collections.deque = collections.deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def attach(self, version: int, build: Callable[[int], Optional[Dict[str, Any]]]) -> None:
+        """Register a subscriber, snapshotting the current state (generation `version`) if none is kept."""
+        with self._lock:
+            self.subscribers += 1
+            if self.snapshot is None:
+                self.version = version
+                self.snapshot = build(version)
+
+    def detach(self) -> None:
+        with self._lock:
+            self.subscribers -= 1
+
+    def publish(self, version: int, build: Callable[[int], Optional[Dict[str, Any]]], reload: bool = False) -> None:
+        """Record the change that made `version` current; `reload` when row ids no longer match (new file)."""
+        with self._lock:
+            if version <= self.version:
+                # Already covered by a snapshot or diff: versions never go backwards
+                return
+            base, self.version = self.version, version
+            if not self.subscribers:
+                self.snapshot = None
+                self.diffs.clear()
+                return
+            old, new = self.snapshot, build(version)
+            self.snapshot = new
+            if reload or old is None or new is None or old["layout"] != new["layout"]:
+                self.diffs.append({"base": base, "version": version, "reload": True})
+            else:
+                self.diffs.append({"base": base, "version": version, "reload": False, **self._diff(old, new)})
+
+    def since(self, version: int) -> Optional[List[Dict[str, Any]]]:
+        """Diffs leading from `version` to the current one, or None when they are no longer kept."""
+        with self._lock:
+            chain = [diff for diff in self.diffs if diff["version"] > version]
+            current = self.version
+        expected = version
+        for diff in chain:
+            if diff["base"] != expected:
+                return None
+            expected = diff["version"]
+        return chain if expected == current else None
+
+    def _diff(self, old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+        old_ids, new_ids = old["row_id"], new["row_id"]
+        _, old_common, new_common = np.intersect1d(old_ids, new_ids, assume_unique=True, return_indices=True)
+        changed = np.zeros(len(new_common), dtype=bool)
+        for name in self.columns:
+            before, after = old[name][old_common], new[name][new_common]
+            differs = before != after
+            if before.dtype == object:
+                differs &= ~(pd.isna(before) & pd.isna(after))
+            changed |= differs
+        added = np.flatnonzero(~np.isin(new_ids, old_ids, assume_unique=True))
+        removed = np.flatnonzero(~np.isin(old_ids, new_ids, assume_unique=True))
+        rows = np.sort(np.concatenate([new_common[changed], added]))
+        return {
+            "removed": old_ids[removed],
+            "removed_at": (old["lat"][removed], old["lon"][removed]),
+            "added": new_ids[added],
+            "row_id": new_ids[rows],
+            "columns": {name: new[name][rows] for name in self.columns},
+            "bands": new["bands"],
+            "reach": max(old["reach"], new["reach"]),
+            # Site labels only appear or go away with rows
+            "sites": new["sites"] if len(added) or len(removed) else None,
+        }
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"version": self.version, "subscribers": self.subscribers, "diffs": len(self.diffs)}
+
+
+class JobCancelled(Exception):
+    """Raised inside a background job once DELETE /api/jobs/{id} asked it to stop."""
+
+
+@dataclasses.dataclass
+class ExportJob:
+    """A background export (KML/KMZ or report) and its progress, as reported by /api/jobs."""
+
+    id: str
+    kind: str
+    filename: str
+    media_type: str
+    rows_total: int
+    rows_done: int = 0
+    status: str = "queued"  # queued, running, done, failed, cancelled
+    error: str = ""
+    path: Optional[str] = None
+    size: int = 0
+    created: float = dataclasses.field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    cancel: threading.Event = dataclasses.field(default_factory=threading.Event, repr=False)
+
+    def advance(self, rows: int) -> None:
+        """Progress callback of the export; also where a cancelled job stops."""
+        if self.cancel.is_set():
+            raise JobCancelled()
+        self.rows_done += rows
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = self.finished or time.time()
+        elapsed = now - self.started if self.started else 0.0
+        progress = min(self.rows_done / self.rows_total, 1.0) if self.rows_total else 0.0
+        if self.status == "done":
+            progress = 1.0
+        eta = None
+        if self.status == "running" and 0 < progress < 1:
+            eta = round(elapsed * (1 - progress) / progress, 1)
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "rows_done": self.rows_done,
+            "rows_total": self.rows_total,
+            "progress": round(progress, 4),
+            "elapsed_seconds": round(elapsed, 1),
+            "eta_seconds": eta,
+            "filename": self.filename,
+            "size": self.size,
+            "error": self.error,
+            "download_url": f"/api/jobs/{self.id}/download" if self.status == "done" else None,
+        }
+
+
+async def run_cpu_bound(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run blocking pandas/NumPy work on CPU_EXECUTOR, keeping the event loop free."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(CPU_EXECUTOR, functools.partial(func, *args, **kwargs))
+
+
+def cpu_bound(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Make a blocking endpoint async by running it on CPU_EXECUTOR (signature kept for FastAPI)."""
+
+    @functools.wraps(func)
+    async def endpoint(*args: Any, **kwargs: Any) -> Any:
+        return await run_cpu_bound(func, *args, **kwargs)
+
+    return endpoint
+
+
+async def run_render(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run map rendering work on RENDER_EXECUTOR, so renders never hold up the CPU_EXECUTOR endpoints."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(RENDER_EXECUTOR, functools.partial(func, *args, **kwargs))
+
+
+def render_bound(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Like cpu_bound, on RENDER_EXECUTOR."""
+
+    @functools.wraps(func)
+    async def endpoint(*args: Any, **kwargs: Any) -> Any:
+        return await run_render(func, *args, **kwargs)
+
+    return endpoint
+
+
+async def iterate_cpu_bound(chunks: Any, generation: Optional[int] = None) -> AsyncIterator[Any]:
+    """Async iterator over a blocking generator whose steps run on CPU_EXECUTOR.
+
+    With a `generation`, the steps are map render batches instead: each one
+    runs on RENDER_EXECUTOR once it holds the render slot (see RenderScheduler).
+    """
+    iterator = iter(chunks)
+    done = object()
+    try:
+        while True:
+            if generation is None:
+                chunk = await run_cpu_bound(next, iterator, done)
+            else:
+                async with RENDERS.slot(generation):
+                    chunk = await run_render(next, iterator, done)
+            if chunk is done:
+                return
+            yield chunk
+    finally:
+        # Lets an abandoned generator release what it holds (e.g. the KML worker pool)
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+
+
+@contextlib.asynccontextmanager
+async def _lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    yield
+    await asyncio.to_thread(_shutdown_jobs)
+
+
+app = FastAPI(lifespan=_lifespan)
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_BYTES, compresslevel=GZIP_LEVEL)
+app.mount("/static", PrecompressedStaticFiles(directory=os.path.join(APP_ROOT, "static")), name="static")
 
 templates = Jinja2Templates(directory=os.path.join(APP_ROOT, "templates"))
 
 
 CURRENT: Dict[str, Any] = {
     "df_full": None,
+    # The filtered view: the rows of df_full at positions `rows` (all of df_full, same object, when None).
+    # A filtered view is only taken by _require_df(), for the endpoints that need it as a DataFrame;
+    # map data, tiles and jobs read its rows through CellFrame.take.
     "df": None,
+    "rows": None,
     "meta": {},
     "mapping": {},
     "label_config": LabelConfig(),
@@ -39,14 +411,88 @@ CURRENT: Dict[str, Any] = {
     "beamwidth_overrides": {},
     "source_name": "",
     "filter_columns": {},
+    "cells": None,
+    # CellFrame of df_full for the current mapping; filtered views take their rows from it
+    "cells_full": None,
+    # Bumped whenever the view changes (upload, filters); part of cache keys
+    "data_version": 0,
 }
+# Held while CURRENT is changed, so a render never sees half of a change (e.g. df without its rows)
+CURRENT_LOCK = threading.RLock()
 
 SESSION_TTL_SECONDS = 45.0
+# Extra area fetched around the viewport by /api/map-data, as a fraction of its size per side
+MAP_BBOX_MARGIN = 0.25
+# At zoom <= CLUSTER_MAX_ZOOM, views (a map-data viewport, a tile) with more than CLUSTER_MIN_CELLS
+# sectors get clusters instead of petals
+CLUSTER_MAX_ZOOM = 11
+CLUSTER_MIN_CELLS = 3000
+# Binary columnar /api/map-data format, selected with this type in the Accept header
+MAP_BINARY_MEDIA_TYPE = "application/x-mob-columns"
+# /api/map-data?stream=true: newline-delimited JSON, one line per batch of sectors of one band
+MAP_STREAM_MEDIA_TYPE = "application/x-ndjson"
+# The same stream for clients accepting MAP_BINARY_MEDIA_TYPE: one MAP_BINARY_MEDIA_TYPE record per
+# line's message, each prefixed by its uint32 LE length
+MAP_BINARY_STREAM_MEDIA_TYPE = "application/x-mob-column-frames"
+MAP_STREAM_BATCH = 2000
+# Most row ids accepted by one POST /api/cells request
+CELL_BATCH_MAX = 500
+# /api/upload: the body is written to a temporary file in blocks of UPLOAD_CHUNK_BYTES and
+# refused (413) past MOB_MAX_UPLOAD_MB, checked on Content-Length and while receiving
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+UPLOAD_MAX_BYTES = int(os.environ.get("MOB_MAX_UPLOAD_MB", "1024")) * 1024 * 1024
+UPLOAD_SUFFIXES = (".csv", ".txt", ".xlsx", ".xls")
+# Parsed uploads on disk, keyed by the SHA-1 of the file (computed while it is spooled)
+INGEST_CACHE = IngestCache(config.INGEST_CACHE_DIR, config.INGEST_CACHE_BYTES)
+# /api/tiles: encoded tiles kept in memory, keyed by (data_version, config hash, z, x, y)
+TILE_CACHE_BYTES = 64 * 1024 * 1024
+TILE_MAX_ZOOM = 22
+TILE_CACHE = LRUCache(max_bytes=TILE_CACHE_BYTES, sizeof=len)
+# /api/map-data: last rendered bodies, keyed by their ETag. Bodies larger than
+# RESPONSE_CACHE_ENTRY_BYTES are sent without being kept; KML/KMZ exports never are.
+RESPONSE_CACHE_ENTRIES = 8
+RESPONSE_CACHE_BYTES = 256 * 1024 * 1024
+RESPONSE_CACHE_ENTRY_BYTES = 32 * 1024 * 1024
+RESPONSE_CACHE = LRUCache(
+    max_entries=RESPONSE_CACHE_ENTRIES, max_bytes=RESPONSE_CACHE_BYTES, sizeof=lambda entry: len(entry[0])
+)
+# Blocking endpoint work runs on this bounded pool so session pings and static assets stay responsive
+CPU_WORKERS = max(1, int(os.environ.get("MOB_CPU_WORKERS", "2")))
+CPU_EXECUTOR = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="mob-cpu")
+# Map renders (map-data, tiles) have their own pool, so a slow render never delays a settings change
+RENDER_WORKERS = max(1, int(os.environ.get("MOB_RENDER_WORKERS", "2")))
+RENDER_EXECUTOR = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="mob-render")
+# Background exports (/api/jobs): their own pool, so long exports never hold up the endpoints;
+# finished artifacts are kept in a temporary directory for JOB_TTL_SECONDS
+JOB_WORKERS = max(1, int(os.environ.get("MOB_JOB_WORKERS", "2")))
+JOB_EXECUTOR = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="mob-job")
+JOB_TTL_SECONDS = 3600.0
+JOB_EVENT_INTERVAL = 0.5
+JOB_FINISHED = ("done", "failed", "cancelled")
+# At shutdown, how long running jobs get to notice their cancellation before the files go
+JOB_SHUTDOWN_WAIT_SECONDS = 5.0
+JOBS: Dict[str, ExportJob] = {}
+JOBS_LOCK = threading.Lock()
+# Map renders (map-data) run one at a time; superseded ones are dropped
+RENDERS = RenderScheduler()
+# Live mode push channel (/api/live/events): diffs kept for late subscribers, the poll
+# interval of each subscriber and how often an idle stream sends a keep-alive comment
+LIVE_HISTORY = 8
+LIVE_POLL_INTERVAL = 0.2
+LIVE_KEEPALIVE_SECONDS = 15.0
+LIVE_COLUMNS = ("lat", "lon", "azimuth", "beamwidth", "radius", "band", "earfcn", "cell_name", "site_name", "cell_label")
+LIVE = LiveChannel(LIVE_HISTORY, LIVE_COLUMNS)
+# Part of every ETag, so validators handed out before a restart never match
+SERVER_INSTANCE = uuid.uuid4().hex[:8]
 DEFAULT_IDLE_SHUTDOWN_SECONDS = 90.0
 RUNTIME_LOCK = threading.Lock()
 RUNTIME: Dict[str, Any] = {
     "sessions": {},
     "last_activity": time.time(),
+    # Temporary directory of the job artifacts, created by the first job
+    "jobs_dir": None,
+    # Parse progress of the last upload, reported by /api/upload/progress
+    "ingest": {"status": "idle", "rows": 0, "bytes_read": 0, "bytes_total": 0},
 }
 
 
@@ -87,11 +533,559 @@ async def activity_middleware(request: Request, call_next):
     return response
 
 
-def _require_df() -> pd.DataFrame:
-    df = CURRENT.get("df")
-    if df is None:
+def _require_data() -> None:
+    if CURRENT.get("df_full") is None:
         raise HTTPException(status_code=400, detail="No data loaded. Upload a file first.")
-    return df
+
+
+def _require_df() -> pd.DataFrame:
+    """The current view as a DataFrame, taking the rows of a filtered view on first use."""
+    with CURRENT_LOCK:
+        _require_data()
+        df, df_full, rows = CURRENT["df"], CURRENT["df_full"], CURRENT["rows"]
+    if df is not None:
+        return df
+    df = _view_frame(df_full, rows)
+    with CURRENT_LOCK:
+        if CURRENT["rows"] is not rows:
+            return df
+        if CURRENT["df"] is None:
+            CURRENT["df"] = df
+        return CURRENT["df"]
+
+
+def _snapshot() -> Dict[str, Any]:
+    """CURRENT as one consistent copy, with the RENDERS `generation` it belongs to, for a render to work from."""
+    with CURRENT_LOCK:
+        _require_data()
+        return {**CURRENT, "generation": RENDERS.generation}
+
+
+def _get_cells(mapping: Optional[Dict[str, str]] = None, state: Optional[Dict[str, Any]] = None) -> CellFrame:
+    """Return the prepared CellFrame, rebuilding it only when data or mapping changed.
+
+    `state` is the _snapshot() to build it from (default: the current state).
+    """
+    if state is None:
+        state = _snapshot()
+    df, current_mapping, rows, df_full = state["df"], state.get("mapping", {}), state["rows"], state["df_full"]
+    cells: Optional[CellFrame] = state.get("cells")
+    if mapping is None:
+        mapping = current_mapping
+    # CURRENT["cells"] is reset whenever the data changes
+    if cells is not None and cells.mapping == mapping:
+        return cells
+    if mapping is not current_mapping:
+        return build_cell_frame(_view_frame(df_full, rows) if df is None else df, mapping)
+    cells = _view_cells(df, rows, df_full, mapping)
+    with CURRENT_LOCK:
+        # Built outside the lock: kept only if the data and mapping are still those it was built for
+        if CURRENT["data_version"] == state["data_version"] and CURRENT.get("mapping") is mapping:
+            CURRENT["cells"] = cells
+    return cells
+
+
+def _view_cells(
+    df: Optional[pd.DataFrame], rows: Optional[np.ndarray], df_full: pd.DataFrame, mapping: Dict[str, str]
+) -> CellFrame:
+    """CellFrame of the view `df` (rows `rows` of df_full, None when not taken yet): df_full is parsed once
+    per mapping, views take rows."""
+    full: Optional[CellFrame] = CURRENT.get("cells_full")
+    if full is None or full.df is not df_full or full.mapping != mapping:
+        full = build_cell_frame(df_full, mapping)
+        with CURRENT_LOCK:
+            if CURRENT["df_full"] is df_full:
+                CURRENT["cells_full"] = full
+    return full if rows is None else full.take(rows, df=df, cache=True)
+
+
+def _parse_bbox(bbox: str) -> Tuple[float, float, float, float]:
+    """Parse a Leaflet bbox string "west,south,east,north" into (south, west, north, east)."""
+    try:
+        west, south, east, north = [float(part) for part in bbox.split(",")]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be 'west,south,east,north'.")
+    if not all(np.isfinite([west, south, east, north])) or south > north or west > east:
+        raise HTTPException(status_code=400, detail="bbox must be 'west,south,east,north'.")
+    return south, west, north, east
+
+
+def _viewport_positions(
+    cells: CellFrame,
+    bbox: Tuple[float, float, float, float],
+    radii: np.ndarray,
+) -> Tuple[np.ndarray, Tuple[float, float, float, float]]:
+    """Rows whose petal can intersect the viewport plus MAP_BBOX_MARGIN.
+
+    The site query box is grown by the longest petal radius so sectors whose
+    site lies just outside the view are still returned. Also returns the
+    margin-expanded box the client can pan inside without refetching.
+    """
+    south, west, north, east = bbox
+    margin_lat = (north - south) * MAP_BBOX_MARGIN
+    margin_lon = (east - west) * MAP_BBOX_MARGIN
+    south, north = max(south - margin_lat, -90.0), min(north + margin_lat, 90.0)
+    west, east = west - margin_lon, east + margin_lon
+
+    reach_m = float(radii.max()) if len(radii) else 0.0
+    positions = cells.in_bbox(*_reach_box((south, west, north, east), reach_m))
+    return positions, (south, west, north, east)
+
+
+def _reach_box(bbox: Tuple[float, float, float, float], reach_m: float) -> Tuple[float, float, float, float]:
+    """`bbox` grown by `reach_m` meters on every side: the sites whose petals can reach into it."""
+    south, west, north, east = bbox
+    reach_lat = reach_m / 111320.0
+    max_abs_lat = min(max(abs(south), abs(north)), 89.0)
+    reach_lon = reach_lat / np.cos(np.radians(max_abs_lat))
+    return south - reach_lat, west - reach_lon, north + reach_lat, east + reach_lon
+
+
+def _clustered(zoom: Optional[int], count: int) -> bool:
+    """Whether a view holding `count` sectors is drawn as clusters at `zoom` (same rule for map-data and tiles)."""
+    return zoom is not None and zoom <= CLUSTER_MAX_ZOOM and count > CLUSTER_MIN_CELLS
+
+
+def _cluster_payload(
+    cells: CellFrame,
+    zoom: int,
+    bbox: Tuple[float, float, float, float],
+) -> List[Dict[str, Any]]:
+    """Precomputed site clusters of the zoom level with their centroid in `bbox`."""
+    band_keys = [info["key"] for info in config.BAND_RANGES] + ["2600"]
+    band_labels = [info["label"] for info in config.BAND_RANGES] + ["Unknown"]
+    lats, lons, counts, mixes = cells.clusters.query(zoom, *bbox)
+
+    clusters = []
+    for lat, lon, count, mix in zip(lats.tolist(), lons.tolist(), counts.tolist(), mixes.tolist()):
+        bands = [
+            {"label": band_labels[idx], "color": _get_band_color_hex(band_keys[idx]), "count": n}
+            for idx, n in sorted(enumerate(mix), key=lambda item: -item[1])
+            if n
+        ]
+        clusters.append({"lat": lat, "lon": lon, "count": count, "color": bands[0]["color"], "bands": bands})
+    return clusters
+
+
+def _compact_map_payload(
+    cells: CellFrame,
+    positions: np.ndarray,
+    mapping: Dict[str, str],
+    label_config: LabelConfig,
+    scale: float,
+    band_scale_overrides: Dict[str, Any],
+    beamwidth_overrides: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Sector parameters as columnar arrays; the client draws the petals itself.
+
+    `band` indexes the `bands` table (BAND_RANGES order, then Unknown).
+    """
+    band_index = cells.band_index[positions]
+    band_index = np.where(band_index >= 0, band_index, len(config.BAND_RANGES))
+    band_keys = [info["key"] for info in config.BAND_RANGES] + ["2600"]
+    band_labels = [info["label"] for info in config.BAND_RANGES] + ["Unknown"]
+    bands = [
+        {"key": key, "label": label, "color": _get_band_color_hex(key)} for key, label in zip(band_keys, band_labels)
+    ]
+
+    cell_labels = [""] * len(positions)
+    if not label_config.hide_cell_label:
+        field = mapping.get("cell_name", "")
+        if label_config.use_site_for_cell:
+            field = mapping.get("site_name", "")
+        if field:
+            cell_labels = [str(value) for value in cells.column_values(field, positions)]
+
+    lat = cells.lat[positions]
+    lon = cells.lon[positions]
+    site_field = label_config.site_field or mapping.get("site_name", "")
+    if label_config.template:
+        site_labels = [build_label(row, site_field, label_config.template) for row in cells.records(positions)]
+    elif site_field:
+        site_labels = [str(value) for value in cells.column_values(site_field, positions)]
+    else:
+        site_labels = [""] * len(positions)
+    sites = {}
+    for label, lat_f, lon_f in zip(site_labels, lat.tolist(), lon.tolist()):
+        if label:
+            sites.setdefault(f"{label}:{lat_f}:{lon_f}", {"label": label, "lat": lat_f, "lon": lon_f})
+
+    row_ids = cells.row_ids[positions]
+    if row_ids.dtype.kind in "iu":
+        row_ids = row_ids.astype(np.float64)
+    return {
+        "cells": [],
+        "sites": list(sites.values()),
+        "compact": {
+            "count": int(len(positions)),
+            "bands": bands,
+            "row_id": row_ids,
+            "lat": lat,
+            "lon": lon,
+            "azimuth": cells.azimuth[positions],
+            "beamwidth": cells.beamwidths(beamwidth_overrides, positions).astype(np.float32),
+            "radius": cells.radii(scale, band_scale_overrides, positions).astype(np.float32),
+            "band": band_index.astype(np.uint16),
+            "earfcn": cells.earfcn[positions],
+            "cell_name": cells.column_values(mapping.get("cell_name"), positions),
+            "site_name": cells.column_values(mapping.get("site_name"), positions),
+            "cell_label": cell_labels,
+        },
+    }
+
+
+def _encode_columns(payload: Dict[str, Any]) -> bytes:
+    """Pack a compact map payload as MAP_BINARY_MEDIA_TYPE.
+
+    Layout: b"MOBC", uint32 LE header length, UTF-8 JSON header (space padded so
+    the data section starts 8-byte aligned), then the NumPy columns as
+    little-endian buffers, each 8-byte aligned. The header is the payload with
+    every array column replaced by a `buffers` entry {name, dtype, offset, length}
+    (offset relative to the data section). A payload without `compact` is sent
+    as its JSON header alone.
+    """
+    columns = {}
+    buffers = []
+    chunks = []
+    offset = 0
+    for name, value in payload.get("compact", {}).items():
+        if not isinstance(value, np.ndarray):
+            columns[name] = value
+            continue
+        data = value.astype(value.dtype.newbyteorder("<"), copy=False).tobytes()
+        buffers.append({"name": name, "dtype": value.dtype.name, "offset": offset, "length": len(value)})
+        padding = -len(data) % 8
+        chunks.append(data + b"\0" * padding)
+        offset += len(data) + padding
+
+    header = dumps_json({**payload, "compact": columns, "buffers": buffers} if "compact" in payload else payload)
+    header += b" " * (-(8 + len(header)) % 8)
+    return b"".join([b"MOBC", len(header).to_bytes(4, "little"), header] + chunks)
+
+
+def _map_response(
+    cells: CellFrame,
+    label_config: LabelConfig,
+    loaded_bbox: Optional[Tuple[float, float, float, float]],
+    zoom: Optional[int],
+    payload: Dict[str, Any],
+) -> Dict[str, Any]:
+    bounds = cells.grid.bounds
+    return {
+        **payload,
+        "total": int(cells.grid.size),
+        "bounds": [[bounds[0], bounds[1]], [bounds[2], bounds[3]]] if bounds else None,
+        "bbox": [loaded_bbox[1], loaded_bbox[0], loaded_bbox[3], loaded_bbox[2]] if loaded_bbox else None,
+        "zoom": zoom,
+        "label_config": {
+            "show_label": label_config.show_label,
+            "text_scale": label_config.text_scale,
+            "text_color": f"#{label_config.text_color}",
+            "shadow": label_config.shadow,
+            "position": label_config.position,
+        },
+    }
+
+
+def _band_batches(cells: CellFrame, positions: np.ndarray, batch_size: int) -> List[np.ndarray]:
+    """Split `positions` into batches of at most `batch_size` rows of a single band.
+
+    Bands follow BAND_RANGES order with unknown last; rows keep their order within a band.
+    """
+    band_index = cells.band_index[positions]
+    band_index = np.where(band_index >= 0, band_index, len(config.BAND_RANGES))
+    order = np.argsort(band_index, kind="stable")
+    ordered = positions[order]
+    bounds = np.flatnonzero(np.diff(band_index[order])) + 1
+    batches = []
+    for band_positions in np.split(ordered, bounds):
+        for start in range(0, len(band_positions), batch_size):
+            batches.append(band_positions[start : start + batch_size])
+    return batches
+
+
+def _encode_stream_message(message: Dict[str, Any], binary: bool) -> bytes:
+    """One streamed map-data message: an NDJSON line, or a length-prefixed MAP_BINARY_MEDIA_TYPE record."""
+    if binary:
+        record = _encode_columns(message)
+        return len(record).to_bytes(4, "little") + record
+    return dumps_json(message) + b"\n"
+
+
+def _iter_map_stream(
+    head: Dict[str, Any], cells: CellFrame, positions: np.ndarray, options: Tuple, binary: bool
+) -> Any:
+    """Messages of a streamed map-data response (see _encode_stream_message).
+
+    The first message is the response without sectors (`count` tells how many
+    follow), then one message per band batch with its `compact` columns and
+    the site labels not sent before, and a final {"done": true}. Iterated with
+    iterate_cpu_bound(..., generation), each batch takes the render slot, so a
+    superseded stream stops before its next batch.
+    """
+    yield _encode_stream_message({**head, "count": int(len(positions))}, binary)
+    seen_sites = set()
+    for batch in _band_batches(cells, positions, MAP_STREAM_BATCH):
+        payload = _compact_map_payload(cells, batch, *options)
+        sites = []
+        for site in payload["sites"]:
+            key = (site["label"], site["lat"], site["lon"])
+            if key not in seen_sites:
+                seen_sites.add(key)
+                sites.append(site)
+        yield _encode_stream_message({"compact": payload["compact"], "sites": sites}, binary)
+    yield _encode_stream_message({"done": True}, binary)
+
+
+def _live_snapshot(version: int) -> Optional[Dict[str, Any]]:
+    """Compact columns of every mapped sector ordered by row id, as LiveChannel diffs them.
+
+    `layout` covers the settings a diff cannot express (mapping, labels, popup
+    fields): when it changes, subscribers reload instead.
+    """
+    mapping = CURRENT.get("mapping", {})
+    label_config: Optional[LabelConfig] = CURRENT.get("label_config")
+    if CURRENT["df_full"] is None or label_config is None or not mapping.get("latitude") or not mapping.get("longitude"):
+        return None
+    cells = _get_cells()
+    payload = _compact_map_payload(
+        cells,
+        cells.positions,
+        mapping,
+        label_config,
+        CURRENT.get("scale", 1.0),
+        CURRENT.get("band_scale_overrides", {}),
+        CURRENT.get("beamwidth_overrides", {}),
+    )
+    compact = payload["compact"]
+    row_ids = cells.row_ids[cells.positions]
+    order = np.argsort(row_ids, kind="stable")
+    snapshot = {
+        "version": version,
+        "layout": json.dumps(
+            [mapping, dataclasses.asdict(label_config), CURRENT.get("extra_fields", [])], sort_keys=True, default=str
+        ),
+        "row_id": row_ids[order],
+        "bands": compact["bands"],
+        "reach": float(compact["radius"].max()) if compact["count"] else 0.0,
+        "sites": payload["sites"],
+    }
+    for name in LIVE_COLUMNS:
+        values = compact[name]
+        snapshot[name] = (np.array(values, dtype=object) if isinstance(values, list) else values)[order]
+    return snapshot
+
+
+def _publish_live(reload: bool = False) -> None:
+    """Hand the change that just advanced RENDERS to the Live mode subscribers.
+
+    Called under CURRENT_LOCK together with RENDERS.advance(), so changes are
+    published in generation order.
+    """
+    LIVE.publish(RENDERS.generation, _live_snapshot, reload)
+
+
+def _attach_live() -> None:
+    # CURRENT_LOCK first, as for _publish_live: the snapshot is taken between two changes
+    with CURRENT_LOCK:
+        LIVE.attach(RENDERS.generation, _live_snapshot)
+
+
+def _live_event(diff: Dict[str, Any], view: Optional[Tuple[float, float, float, float]]) -> bytes:
+    """One /api/live/events message: `diff` restricted to the area the subscriber has loaded.
+
+    Sites never move in a diff (coordinates come from the mapping, whose change
+    is a reload), so rows outside `view` are neither drawn nor sent.
+    """
+    if diff["reload"]:
+        return dumps_json({"version": diff["version"], "reload": True})
+    row_ids, columns = diff["row_id"], diff["columns"]
+    removed, sites = diff["removed"], diff["sites"]
+    inside = np.ones(len(row_ids), dtype=bool)
+    if view is not None:
+        south, west, north, east = _reach_box(view, diff["reach"])
+        lat, lon = columns["lat"], columns["lon"]
+        inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+        lat, lon = diff["removed_at"]
+        removed = removed[(lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)]
+        if sites is not None:
+            south, west, north, east = view
+            sites = [site for site in sites if south <= site["lat"] <= north and west <= site["lon"] <= east]
+    compact = {"count": int(inside.sum()), "bands": diff["bands"], "row_id": row_ids[inside]}
+    for name, values in columns.items():
+        values = values[inside]
+        compact[name] = values.tolist() if values.dtype == object else values
+    return dumps_json(
+        {
+            "version": diff["version"],
+            "removed": removed,
+            "added": row_ids[inside & np.isin(row_ids, diff["added"])],
+            "compact": compact,
+            "sites": sites,
+        }
+    )
+
+
+def _config_hash(state: Optional[Dict[str, Any]] = None) -> str:
+    """Short hash of every setting that changes what the map shows for the same data (of `state`, default CURRENT)."""
+    if state is None:
+        state = CURRENT
+    label_config: LabelConfig = state.get("label_config")
+    settings = {
+        "mapping": state.get("mapping", {}),
+        "label_config": dataclasses.asdict(label_config) if label_config else {},
+        "extra_fields": state.get("extra_fields", []),
+        "scale": state.get("scale", 1.0),
+        "band_scale_overrides": state.get("band_scale_overrides", {}),
+        "beamwidth_overrides": state.get("beamwidth_overrides", {}),
+    }
+    encoded = json.dumps(settings, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+
+def _response_etag(state: Dict[str, Any], *params: Any) -> str:
+    """ETag of a response rendered from `state` (a _snapshot()): dataset version, settings hash and parameters."""
+    key = json.dumps([state["data_version"], _config_hash(state), *params], default=str)
+    return '"%s-%s"' % (SERVER_INSTANCE, hashlib.sha1(key.encode("utf-8")).hexdigest()[:16])
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    tags = [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]
+    return etag in tags or "*" in tags
+
+
+async def _memoize_stream(etag: str, chunks: AsyncIterator[bytes], media_type: str, headers: Dict[str, str]):
+    """Pass a streamed body through, keeping it in RESPONSE_CACHE once it completed."""
+    parts: Optional[List[bytes]] = []
+    size = 0
+    try:
+        async for chunk in chunks:
+            yield chunk
+            if parts is not None:
+                parts.append(chunk)
+                size += len(chunk)
+                if size > RESPONSE_CACHE_ENTRY_BYTES:
+                    parts = None
+    except RenderSuperseded:
+        # The body ends early (without its last line) and is not kept
+        return
+    if parts is not None:
+        RESPONSE_CACHE.put(etag, (b"".join(parts), media_type, headers))
+
+
+async def _memoized_response(
+    request: Request,
+    etag: str,
+    render: Callable[[], Response],
+    generation: Optional[int] = None,
+    memoize: bool = True,
+) -> Response:
+    """Serve `render()` (run in the thread pool) through RESPONSE_CACHE under `etag`.
+
+    GET requests whose If-None-Match holds the ETag get a 304. Streamed
+    responses are stored once fully sent, so an aborted download is not kept;
+    bodies above RESPONSE_CACHE_ENTRY_BYTES are never kept, nor any with
+    `memoize` off (the response only gets its validators). With a
+    `generation`, `render` is a map render: it runs on RENDER_EXECUTOR once it
+    holds the render slot, or raises RenderSuperseded.
+    """
+    validators = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.method == "GET" and _etag_matches(request, etag):
+        return Response(status_code=304, headers=validators)
+    cached = RESPONSE_CACHE.get(etag) if memoize else None
+    if cached is not None:
+        body, media_type, headers = cached
+        return Response(body, media_type=media_type, headers={**headers, **validators, "X-Cache": "HIT"})
+
+    if generation is None:
+        response = await run_cpu_bound(render)
+    else:
+        async with RENDERS.slot(generation):
+            response = await run_render(render)
+    headers = {key: value for key, value in response.headers.items() if key in ("content-disposition", "vary")}
+    if memoize and isinstance(response, StreamingResponse):
+        response.body_iterator = _memoize_stream(etag, response.body_iterator, response.media_type, headers)
+    elif memoize and len(response.body) <= RESPONSE_CACHE_ENTRY_BYTES:
+        RESPONSE_CACHE.put(etag, (response.body, response.media_type, headers))
+    response.headers.update({**validators, "X-Cache": "MISS"})
+    return response
+
+
+def _tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(south, west, north, east) of an XYZ (slippy map) tile."""
+    n = 2**z
+
+    def tile_lat(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return tile_lat(y + 1), x / n * 360.0 - 180.0, tile_lat(y), (x + 1) / n * 360.0 - 180.0
+
+
+def _tile_simplification(z: int) -> Tuple[int, int]:
+    """(arc points per petal, coordinate decimals) detailed enough for zoom `z`."""
+    points = 24 if z >= 15 else 12 if z >= 13 else 6
+    # One decimal finer than a pixel (360 / (256 * 2**z) degrees)
+    decimals = int(math.ceil(math.log10(256 * 2**z / 360.0))) + 1
+    return points, max(decimals, 1)
+
+
+def _build_tile(state: Dict[str, Any], z: int, x: int, y: int) -> Dict[str, Any]:
+    mapping = state.get("mapping", {})
+    label_config: LabelConfig = state.get("label_config")
+    scale = state.get("scale", 1.0)
+    band_scale_overrides = state.get("band_scale_overrides", {})
+    beamwidth_overrides = state.get("beamwidth_overrides", {})
+    cells = _get_cells(state=state)
+    south, west, north, east = _tile_bounds(z, x, y)
+
+    features = []
+    if _clustered(z, len(cells.in_bbox(south, west, north, east))):
+        # Each cluster belongs to the one tile holding its centroid
+        for cluster in _cluster_payload(cells, z, (south, west, north, east)):
+            features.append(
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [cluster["lon"], cluster["lat"]]},
+                    "properties": {key: cluster[key] for key in ("count", "color", "bands")},
+                }
+            )
+        return {"type": "FeatureCollection", "features": features}
+
+    # Petals are included in every tile they can touch; the feature id (row id) lets clients dedupe
+    radii = cells.radii(scale, band_scale_overrides, cells.positions)
+    reach_lat = (float(radii.max()) if len(radii) else 0.0) / 111320.0
+    reach_lon = reach_lat / math.cos(math.radians(min(max(abs(south), abs(north)), 89.0)))
+    positions = cells.in_bbox(south - reach_lat, west - reach_lon, north + reach_lat, east + reach_lon)
+    points, decimals = _tile_simplification(z)
+    vertices, counts = cells.petals(scale, band_scale_overrides, beamwidth_overrides, positions=positions, points=points)
+    vertices = np.round(vertices, decimals)
+
+    for idx, row in enumerate(cells.records(positions)):
+        pos = positions[idx]
+        band_info = cells.band_info(pos)
+        band_key = band_info["key"] if band_info else "2600"
+        cell_label = ""
+        if not label_config.hide_cell_label:
+            field = mapping.get("cell_name", "")
+            if label_config.use_site_for_cell:
+                field = mapping.get("site_name", "")
+            cell_label = build_label(row, field, "")
+        features.append(
+            {
+                "type": "Feature",
+                "id": cells.row_ids[pos].item(),
+                "geometry": {"type": "Polygon", "coordinates": [vertices[idx, : counts[idx]].tolist()]},
+                "properties": {
+                    "cell_name": row.get(mapping.get("cell_name", ""), ""),
+                    "site_name": row.get(mapping.get("site_name", ""), ""),
+                    "band_key": band_key,
+                    "band_label": band_info["label"] if band_info else "Unknown",
+                    "color": _get_band_color_hex(band_key),
+                    "cell_label": cell_label,
+                },
+            }
+        )
+    return {"type": "FeatureCollection", "features": features}
 
 
 def _normalize_col(name: str) -> str:
@@ -121,7 +1115,8 @@ def detect_filter_columns(columns: List[str]) -> Dict[str, str]:
                 for k in keywords:
                     if k == "state" and len(col_norm) > 6:
                         continue
-                    if col_norm.startswith(k) or col_norm.endswith(k):
+                    # Two-letter keywords only as a prefix: "earfcn" ends in "cn"
+                    if col_norm.startswith(k) or (len(k) > 2 and col_norm.endswith(k)):
                         found = original
                         break
                 if found:
@@ -131,6 +1126,32 @@ def detect_filter_columns(columns: List[str]) -> Dict[str, str]:
     return mapping
 
 
+def _filter_rows(df_full: pd.DataFrame, filters: Dict[str, List[Any]]) -> Optional[np.ndarray]:
+    """Positions of the rows of `df_full` whose value is in the selected list of every filtered column.
+
+    None when no filter applies. Columns are text or categoricals of text, so
+    values are matched as text without converting the column.
+    """
+    mask = None
+    for col, values in filters.items():
+        if col not in df_full.columns:
+            continue
+        if not values:
+            continue
+        selected = df_full[col].isin([str(v) for v in values]).to_numpy()
+        mask = selected if mask is None else mask & selected
+    return None if mask is None else np.flatnonzero(mask)
+
+
+def _view_frame(df_full: pd.DataFrame, rows: Optional[np.ndarray]) -> pd.DataFrame:
+    """The view of df_full at `rows`: df_full itself when unfiltered, otherwise its rows taken once.
+
+    A taken frame holds only per-row codes and references: categories and
+    strings stay shared with df_full.
+    """
+    return df_full if rows is None else df_full.take(rows)
+
+
 def _kml_color_to_hex(kml_color: str) -> str:
     # Input AABBGGRR, output #RRGGBB
     if not kml_color or len(kml_color) != 8:
@@ -146,7 +1167,12 @@ def _get_band_color_hex(band_key: str) -> str:
     return _kml_color_to_hex(kml_color)
 
 
-def _build_popup_html(row: pd.Series, mapping: Dict[str, str], extra_fields: List[str]) -> str:
+def _build_popup_html(
+    row: Dict[str, Any],
+    mapping: Dict[str, str],
+    extra_fields: List[str],
+    band_label: Optional[str] = None,
+) -> str:
     site_val = row.get(mapping.get("site_name", ""), "")
     cell_val = row.get(mapping.get("cell_name", ""), "")
     lat_val = row.get(mapping.get("latitude", ""), "")
@@ -154,8 +1180,9 @@ def _build_popup_html(row: pd.Series, mapping: Dict[str, str], extra_fields: Lis
     earfcn_val = row.get(mapping.get("earfcn", ""), "")
     az_val = row.get(mapping.get("azimuth", ""), "")
 
-    band_info = earfcn_utils.get_band_info(earfcn_val)
-    band_label = band_info["label"] if band_info else "Unknown"
+    if band_label is None:
+        band_info = earfcn_utils.get_band_info(earfcn_val)
+        band_label = band_info["label"] if band_info else "Unknown"
 
     lines = [
         f"<b>Site:</b> {site_val}",
@@ -227,54 +1254,236 @@ async def session_close(payload: Dict[str, Any] = Body(default={})):
     return {"ok": True}
 
 
+def _upload_too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File larger than {UPLOAD_MAX_BYTES // (1024 * 1024)} MB.")
+
+
+async def _read_chunks(file: Any) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _write_block(handle: Any, digest: Any, block: bytearray) -> None:
+    digest.update(block)
+    handle.write(block)
+
+
+async def _spool_upload(chunks: AsyncIterator[bytes], suffix: str) -> Tuple[str, str]:
+    """Write an upload to a temporary file in UPLOAD_CHUNK_BYTES blocks; returns its path and SHA-1.
+
+    Only one block is held in memory. The file is removed (and 413 raised) as
+    soon as the upload exceeds UPLOAD_MAX_BYTES.
+    """
+    handle = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    digest = hashlib.sha1()
+    size = 0
+    pending = bytearray()
+    try:
+        with handle:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > UPLOAD_MAX_BYTES:
+                    raise _upload_too_large()
+                pending += chunk
+                if len(pending) >= UPLOAD_CHUNK_BYTES:
+                    await asyncio.to_thread(_write_block, handle, digest, pending)
+                    pending.clear()
+            await asyncio.to_thread(_write_block, handle, digest, pending)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(handle.name)
+        raise
+    return handle.name, digest.hexdigest()
+
+
 @app.post("/api/upload")
-async def upload_file(file: UploadFile = File(...)):
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="Empty filename.")
+async def upload_file(request: Request, filename: str = "", columns: str = "", profile: str = "", sheet: str = ""):
+    """Load a CSV/TXT/XLSX file sent as the raw request body (name in `filename`) or as form field "file".
 
-    suffix = os.path.splitext(file.filename)[1]
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        content = await file.read()
-        tmp.write(content)
-        tmp_path = tmp.name
+    `columns` (comma-separated) or the columns used by the saved `profile`
+    limit what is loaded (see _column_filter); all columns are loaded otherwise.
+    For workbooks, `sheet` names the sheets to load and concatenate
+    (comma-separated, or "*" for all); the first sheet is loaded by default.
 
+    The raw body is checked against UPLOAD_MAX_BYTES as it is written to disk.
+    A multipart form is spooled whole by the form parser before the file part
+    can be read, so there the cap rests on Content-Length, which is required.
+    """
     try:
-        df, meta = file_handler.load_file(tmp_path)
+        content_length = int(request.headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Content-Length header.")
+    if content_length > UPLOAD_MAX_BYTES:
+        raise _upload_too_large()
+    form = None
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        if "content-length" not in request.headers:
+            raise HTTPException(status_code=411, detail="Multipart uploads need a Content-Length header.")
+        form = await request.form(max_files=1)
+        file = form.get("file")
+        if file is None or isinstance(file, str):
+            raise HTTPException(status_code=400, detail="No file in the form.")
+        filename, chunks = file.filename or "", _read_chunks(file)
+    else:
+        chunks = request.stream()
+    try:
+        if not filename:
+            raise HTTPException(status_code=400, detail="Empty filename.")
+        suffix = os.path.splitext(filename)[1]
+        if suffix.lower() not in UPLOAD_SUFFIXES:
+            raise HTTPException(status_code=400, detail=f"Unsupported file type: {suffix or filename}")
+        tmp_path, digest = await _spool_upload(chunks, suffix)
     finally:
-        try:
+        if form is not None:
+            await form.close()
+    try:
+        wanted = [name.strip() for name in columns.split(",") if name.strip()]
+        sheets = _sheet_selection(sheet)
+        return await run_cpu_bound(_load_upload, tmp_path, filename, digest, wanted, profile, sheets)
+    finally:
+        with contextlib.suppress(OSError):
             os.remove(tmp_path)
-        except OSError:
-            pass
+
+
+@app.get("/api/ingest-cache")
+@cpu_bound
+def ingest_cache_stats():
+    return INGEST_CACHE.stats()
+
+
+@app.delete("/api/ingest-cache")
+@cpu_bound
+def clear_ingest_cache():
+    """Drop every parsed upload kept on disk, so the next upload of any file is parsed again."""
+    return {"removed": INGEST_CACHE.clear(), **INGEST_CACHE.stats()}
+
+
+@app.get("/api/upload/progress")
+async def upload_progress():
+    """Parse progress of the upload being loaded: rows parsed and bytes of the file read."""
+    return dict(RUNTIME["ingest"])
+
+
+def _profile_columns(profile: Dict[str, Any]) -> List[str]:
+    """Source columns a saved profile refers to: mapping, popup fields, label fields and template."""
+    label = profile.get("label_config") or {}
+    names = [*(profile.get("mapping") or {}).values(), *(profile.get("extra_fields") or [])]
+    names += [label.get("site_field"), label.get("cell_field")]
+    with contextlib.suppress(ValueError):
+        names += [field for _, field, _, _ in string.Formatter().parse(label.get("template") or "")]
+    return [name for name in names if name]
+
+
+def _column_filter(wanted: List[str], header: List[str], skipped: set) -> Callable[[str], bool]:
+    """`usecols` of load_file: the wanted columns plus the regional filter columns detected in `header`.
+
+    The other columns go to `skipped`.
+    """
+    wanted = set(wanted) | set(detect_filter_columns(header).values())
+
+    def keep(name: str) -> bool:
+        if name in wanted:
+            return True
+        skipped.add(name)
+        return False
+
+    return keep
+
+
+def _ingest_progress(rows: int, bytes_read: int, bytes_total: int) -> None:
+    RUNTIME["ingest"] = {"status": "parsing", "rows": rows, "bytes_read": bytes_read, "bytes_total": bytes_total}
+
+
+def _sheet_selection(sheet: str) -> Any:
+    """`sheet` of load_file from the upload query: None (first sheet), "*" (all) or a list of names."""
+    if not sheet.strip() or sheet.strip() == "*":
+        return sheet.strip() or None
+    return [name.strip() for name in sheet.split(",") if name.strip()]
+
+
+def _parse_upload(path: str, wanted: List[str], sheets: Any) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    skipped: set = set()
+    usecols = _column_filter(wanted, file_handler.read_header(path, sheets), skipped) if wanted else None
+    df, meta = file_handler.load_file(path, usecols=usecols, progress=_ingest_progress, sheet=sheets)
+    if usecols is not None and not set(wanted) & set(df.columns):
+        # The profile belongs to another layout: load everything rather than nothing useful
+        skipped.clear()
+        df, meta = file_handler.load_file(path, progress=_ingest_progress, sheet=sheets)
+    meta["skipped_columns"] = sorted(skipped)
+    meta["memory"] = file_handler.compact_frame(df)
+    return df, meta
+
+
+def _load_upload(path: str, filename: str, digest: str, wanted: List[str], profile: str, sheets: Any) -> Response:
+    if profile and not wanted:
+        wanted = _profile_columns(_read_profile(profile))
+    size = os.path.getsize(path)
+    _ingest_progress(0, 0, size)
+    key = IngestCache.key(digest, suffix=os.path.splitext(filename)[1].lower(), columns=sorted(wanted), sheet=sheets)
+    cached = INGEST_CACHE.get(key) if INGEST_CACHE.max_bytes else None
+    try:
+        if cached is not None:
+            df, meta = cached
+        else:
+            df, meta = _parse_upload(path, wanted, sheets)
+            if INGEST_CACHE.max_bytes:
+                INGEST_CACHE.put(key, df, meta)
+    except ValueError as exc:
+        # Unknown sheet or unreadable file
+        RUNTIME["ingest"] = {**RUNTIME["ingest"], "status": "failed"}
+        raise HTTPException(status_code=400, detail=str(exc))
+    except Exception:
+        RUNTIME["ingest"] = {**RUNTIME["ingest"], "status": "failed"}
+        raise
+    RUNTIME["ingest"] = {"status": "done", "rows": len(df), "bytes_read": size, "bytes_total": size}
+    meta = {**meta, "cached": cached is not None}
 
     filter_columns = detect_filter_columns(list(df.columns))
-    CURRENT["df"] = df
-    CURRENT["df_full"] = df.copy()
-    CURRENT["meta"] = meta
-    CURRENT["source_name"] = file.filename
-    CURRENT["filter_columns"] = filter_columns
+    with CURRENT_LOCK:
+        CURRENT["df"] = df
+        CURRENT["df_full"] = df
+        CURRENT["rows"] = None
+        CURRENT["meta"] = meta
+        CURRENT["source_name"] = filename
+        CURRENT["filter_columns"] = filter_columns
+        CURRENT["cells"] = None
+        CURRENT["cells_full"] = None
+        CURRENT["data_version"] += 1
+        RENDERS.advance()
+        # Row ids of a new file say nothing about the sectors drawn from the previous one
+        _publish_live(reload=True)
 
     preview = df.head(config.PREVIEW_ROWS).to_dict(orient="records")
-    return {
-        "columns": list(df.columns),
-        "preview": preview,
-        "total_rows": len(df),
-        "meta": meta,
-        "source_name": file.filename,
-        "filter_columns": filter_columns,
-    }
+    return FastJSONResponse(
+        {
+            "columns": list(df.columns),
+            "preview": preview,
+            "total_rows": len(df),
+            "meta": meta,
+            "source_name": filename,
+            "filter_columns": filter_columns,
+        }
+    )
 
 
 @app.post("/api/auto-map")
-async def auto_map():
+@cpu_bound
+def auto_map():
     df = _require_df()
     mapping = column_mapper.auto_map_columns(df)
     issues = column_mapper.validate_mapping(df, mapping)
-    CURRENT["mapping"] = mapping
+    with CURRENT_LOCK:
+        CURRENT["mapping"] = mapping
+    _get_cells()
     return {"mapping": mapping, "issues": issues}
 
 
 @app.post("/api/validate-mapping")
-async def validate_mapping(payload: Dict[str, Any] = Body(...)):
+@cpu_bound
+def validate_mapping(payload: Dict[str, Any] = Body(...)):
     df = _require_df()
     mapping = payload.get("mapping", {})
 
@@ -300,12 +1509,11 @@ async def validate_mapping(payload: Dict[str, Any] = Body(...)):
 
 
 @app.post("/api/set-config")
-async def set_config(payload: Dict[str, Any] = Body(...)):
+@cpu_bound
+def set_config(payload: Dict[str, Any] = Body(...)):
     mapping = payload.get("mapping", {})
     label_conf = payload.get("label_config", {})
-
-    CURRENT["mapping"] = mapping
-    CURRENT["label_config"] = LabelConfig(
+    label_config = LabelConfig(
         site_field=label_conf.get("site_field", ""),
         cell_field=label_conf.get("cell_field", ""),
         use_site_for_cell=bool(label_conf.get("use_site_for_cell", False)),
@@ -317,60 +1525,69 @@ async def set_config(payload: Dict[str, Any] = Body(...)):
         position=str(label_conf.get("position", "center")),
         template=str(label_conf.get("template", "")),
     )
-    CURRENT["extra_fields"] = payload.get("extra_fields", [])
-    CURRENT["scale"] = float(payload.get("scale", 1.0))
-    CURRENT["band_scale_overrides"] = payload.get("band_scale_overrides", {})
-    CURRENT["beamwidth_overrides"] = payload.get("beamwidth_overrides", {})
+    scale = float(payload.get("scale", 1.0))
+
+    with CURRENT_LOCK:
+        previous = _config_hash()
+        CURRENT["mapping"] = mapping
+        CURRENT["label_config"] = label_config
+        CURRENT["extra_fields"] = payload.get("extra_fields", [])
+        CURRENT["scale"] = scale
+        CURRENT["band_scale_overrides"] = payload.get("band_scale_overrides", {})
+        CURRENT["beamwidth_overrides"] = payload.get("beamwidth_overrides", {})
+        # Live mode posts the config on every UI change; only an effective change supersedes renders
+        if _config_hash() != previous:
+            RENDERS.advance()
+            _publish_live()
+    if CURRENT["df_full"] is not None and mapping.get("latitude") and mapping.get("longitude"):
+        _get_cells()
     return {"ok": True}
 
 
 @app.post("/api/filter-values")
-async def filter_values(payload: Dict[str, Any] = Body(...)):
+@cpu_bound
+def filter_values(payload: Dict[str, Any] = Body(...)):
     df_full = CURRENT.get("df_full")
     if df_full is None:
         raise HTTPException(status_code=400, detail="No data loaded.")
     column = payload.get("column")
     if not column or column not in df_full.columns:
         raise HTTPException(status_code=400, detail="Invalid column.")
-    filters = payload.get("filters", {})
-
-    df = df_full.copy()
-    for col, values in filters.items():
-        if col == column:
-            continue
-        if col not in df.columns:
-            continue
-        if not values:
-            continue
-        df = df[df[col].astype(str).isin([str(v) for v in values])]
+    filters = {col: values for col, values in payload.get("filters", {}).items() if col != column}
 
-    values = df[column].fillna("").astype(str)
-    unique_vals = sorted({v.strip() for v in values if v.strip() != ""})
+    rows = _filter_rows(df_full, filters)
+    values = df_full[column] if rows is None else df_full[column].take(rows)
+    unique_vals = sorted({str(v).strip() for v in values.dropna().unique()} - {""})
     return {"values": unique_vals[:2000]}
 
 
 @app.post("/api/apply-filters")
-async def apply_filters(payload: Dict[str, Any] = Body(...)):
+@cpu_bound
+def apply_filters(payload: Dict[str, Any] = Body(...)):
     df_full = CURRENT.get("df_full")
     if df_full is None:
         raise HTTPException(status_code=400, detail="No data loaded.")
-    filters = payload.get("filters", {})
-    df = df_full.copy()
-    for col, values in filters.items():
-        if col not in df.columns:
-            continue
-        if not values:
-            continue
-        df = df[df[col].astype(str).isin([str(v) for v in values])]
-
-    CURRENT["df"] = df
-    preview = df.head(config.PREVIEW_ROWS).to_dict(orient="records")
-    return {"total_rows": len(df), "preview": preview}
+    rows = _filter_rows(df_full, payload.get("filters", {}))
+
+    with CURRENT_LOCK:
+        if CURRENT["df_full"] is not df_full:
+            raise HTTPException(status_code=409, detail="The data changed while the filters were applied.")
+        CURRENT["df"] = df_full if rows is None else None
+        CURRENT["rows"] = rows
+        CURRENT["cells"] = None
+        CURRENT["data_version"] += 1
+        RENDERS.advance()
+        _publish_live()
+    head = df_full if rows is None else df_full.take(rows[: config.PREVIEW_ROWS])
+    preview = head.head(config.PREVIEW_ROWS).to_dict(orient="records")
+    total_rows = len(df_full) if rows is None else len(rows)
+    return FastJSONResponse({"total_rows": total_rows, "preview": preview})
 
 
 @app.get("/api/search")
-async def search_sites(q: str, mode: str = "site"):
-    df = _require_df()
+@cpu_bound
+def search_sites(q: str, mode: str = "site"):
+    _require_data()
     mapping = CURRENT.get("mapping", {})
     label_config: LabelConfig = CURRENT.get("label_config")
     filter_columns = CURRENT.get("filter_columns", {})
@@ -378,7 +1595,7 @@ async def search_sites(q: str, mode: str = "site"):
     lat_field = mapping.get("latitude", "")
     lon_field = mapping.get("longitude", "")
     if not lat_field or not lon_field:
-        auto_mapping = column_mapper.auto_map_columns(df)
+        auto_mapping = column_mapper.auto_map_columns(_require_df())
         lat_field = lat_field or auto_mapping.get("latitude", "")
         lon_field = lon_field or auto_mapping.get("longitude", "")
     if not lat_field or not lon_field:
@@ -388,67 +1605,57 @@ async def search_sites(q: str, mode: str = "site"):
     if len(query) < 2:
         return []
 
+    if lat_field == mapping.get("latitude") and lon_field == mapping.get("longitude"):
+        cells = _get_cells()
+    else:
+        cells = _get_cells({**mapping, "latitude": lat_field, "longitude": lon_field})
+
     if mode == "city":
-        city_col = filter_columns.get("municipio") or detect_filter_columns(list(df.columns)).get("municipio")
+        city_col = filter_columns.get("municipio") or detect_filter_columns(list(cells.columns)).get("municipio")
         if not city_col:
             return []
-        df_city = df[[city_col, lat_field, lon_field]].copy()
-        df_city = df_city.dropna()
-        df_city[city_col] = df_city[city_col].astype(str)
-        df_city = df_city[df_city[city_col].str.lower().str.contains(query, na=False)]
-        if df_city.empty:
+        city_vals = cells.column(city_col).astype(str)
+        matches = cells.valid & city_vals.str.lower().str.contains(query, regex=False, na=False).to_numpy()
+        if not matches.any():
             return []
 
-        grouped = df_city.groupby(city_col)
+        df_city = pd.DataFrame(
+            {"name": city_vals.to_numpy()[matches], "lat": cells.lat[matches], "lon": cells.lon[matches]}
+        )
+        grouped = df_city.groupby("name").agg(lat=("lat", "mean"), lon=("lon", "mean"), count=("lat", "size"))
         results = []
-        for name, group in grouped:
-            try:
-                lat_mean = group[lat_field].astype(float).mean()
-                lon_mean = group[lon_field].astype(float).mean()
-            except ValueError:
-                continue
+        for name, group in grouped.head(50).iterrows():
             results.append(
                 {
                     "label": name,
-                    "count": int(len(group)),
-                    "lat": float(lat_mean),
-                    "lon": float(lon_mean),
+                    "count": int(group["count"]),
+                    "lat": float(group["lat"]),
+                    "lon": float(group["lon"]),
                     "kind": "city",
                 }
             )
-            if len(results) >= 50:
-                break
-        return results
+        return FastJSONResponse(results)
 
     site_field = label_config.site_field or mapping.get("site_name", "")
     cell_field = mapping.get("cell_name", "")
     if not site_field:
-        auto_mapping = column_mapper.auto_map_columns(df)
+        auto_mapping = column_mapper.auto_map_columns(_require_df())
         site_field = auto_mapping.get("site_name", "")
         cell_field = cell_field or auto_mapping.get("cell_name", "")
     if not site_field:
         return []
 
+    site_vals = cells.column(site_field).astype(str).str.strip()
+    cell_vals = cells.column(cell_field).astype(str).str.strip()
+    haystack = (site_vals + " " + cell_vals).str.lower()
+    matches = cells.valid & (site_vals != "").to_numpy() & haystack.str.contains(query, regex=False).to_numpy()
+
     results = []
     seen = set()
 
-    for _, row in df.iterrows():
-        site_val = str(row.get(site_field, "")).strip()
-        cell_val = str(row.get(cell_field, "")).strip() if cell_field else ""
-        lat = row.get(lat_field, "")
-        lon = row.get(lon_field, "")
-        if site_val == "" or lat == "" or lon == "":
-            continue
-        try:
-            lat_f = float(lat)
-            lon_f = float(lon)
-        except ValueError:
-            continue
-
-        haystack = f"{site_val} {cell_val}".lower()
-        if query not in haystack:
-            continue
-
+    for pos in np.flatnonzero(matches):
+        site_val = site_vals.iat[pos]
+        cell_val = cell_vals.iat[pos]
         key = f"{site_val}:{cell_val}"
         if key in seen:
             continue
@@ -457,64 +1664,79 @@ async def search_sites(q: str, mode: str = "site"):
             {
                 "site_name": site_val,
                 "cell_name": cell_val,
-                "lat": lat_f,
-                "lon": lon_f,
+                "lat": float(cells.lat[pos]),
+                "lon": float(cells.lon[pos]),
                 "kind": "site",
             }
         )
         if len(results) >= 50:
             break
 
-    return results
+    return FastJSONResponse(results)
 
 
-@app.get("/api/map-data")
-async def map_data():
-    df = _require_df()
-    mapping = CURRENT.get("mapping", {})
-    label_config: LabelConfig = CURRENT.get("label_config")
-    extra_fields = CURRENT.get("extra_fields", [])
-    scale = CURRENT.get("scale", 1.0)
-    band_scale_overrides = CURRENT.get("band_scale_overrides", {})
-    beamwidth_overrides = CURRENT.get("beamwidth_overrides", {})
+def _map_stream_response(messages: Any, binary: bool, generation: int) -> StreamingResponse:
+    media_type = MAP_BINARY_STREAM_MEDIA_TYPE if binary else MAP_STREAM_MEDIA_TYPE
+    return StreamingResponse(iterate_cpu_bound(messages, generation), media_type=media_type, headers={"Vary": "Accept"})
+
+
+def _build_map_data(
+    state: Dict[str, Any], bbox: Optional[str], zoom: Optional[int], compact: bool, stream: bool, binary: bool
+) -> Response:
+    """Map data rendered from `state` (a _snapshot()), so the body always matches the ETag it is cached under."""
+    mapping = state.get("mapping", {})
+    label_config: LabelConfig = state.get("label_config")
+    scale = state.get("scale", 1.0)
+    band_scale_overrides = state.get("band_scale_overrides", {})
+    beamwidth_overrides = state.get("beamwidth_overrides", {})
+    generation = state["generation"]
 
     if not mapping.get("latitude") or not mapping.get("longitude"):
         raise HTTPException(status_code=400, detail="Mapping must include latitude and longitude.")
 
-    cells = []
-    sites = {}
+    cells = _get_cells(state=state)
+    positions = cells.positions
+    loaded_bbox = None
+    if bbox:
+        radii = cells.radii(scale, band_scale_overrides, positions)
+        positions, loaded_bbox = _viewport_positions(cells, _parse_bbox(bbox), radii)
+        if _clustered(zoom, len(positions)):
+            clusters = _cluster_payload(cells, zoom, loaded_bbox)
+            payload = {"cells": [], "sites": [], "clusters": clusters}
+            response = _map_response(cells, label_config, loaded_bbox, zoom, payload)
+            if stream:
+                messages = _iter_map_stream(response, cells, positions[:0], (), binary)
+                return _map_stream_response(messages, binary, generation)
+            return FastJSONResponse(response)
+    if stream:
+        # Always compact; batches are encoded while the previous ones are being sent
+        head = _map_response(cells, label_config, loaded_bbox, zoom, {"cells": [], "sites": []})
+        options = (mapping, label_config, scale, band_scale_overrides, beamwidth_overrides)
+        messages = _iter_map_stream(head, cells, positions, options, binary)
+        return _map_stream_response(messages, binary, generation)
+    if compact or binary:
+        payload = _compact_map_payload(
+            cells, positions, mapping, label_config, scale, band_scale_overrides, beamwidth_overrides
+        )
+        if binary:
+            body = _encode_columns(_map_response(cells, label_config, loaded_bbox, zoom, payload))
+            return Response(body, media_type=MAP_BINARY_MEDIA_TYPE, headers={"Vary": "Accept"})
+        return FastJSONResponse(_map_response(cells, label_config, loaded_bbox, zoom, payload))
+    vertices, counts = cells.petals(scale, band_scale_overrides, beamwidth_overrides, positions=positions)
 
-    for _, row in df.iterrows():
-        lat = row.get(mapping.get("latitude"), "")
-        lon = row.get(mapping.get("longitude"), "")
-        if lat == "" or lon == "":
-            continue
-        try:
-            lat_f = float(lat)
-            lon_f = float(lon)
-        except ValueError:
-            continue
+    cells_out = []
+    sites = {}
 
-        earfcn = row.get(mapping.get("earfcn", ""), "")
-        band_info = earfcn_utils.get_band_info(earfcn)
+    for idx, row in enumerate(cells.records(positions)):
+        if idx % MAP_STREAM_BATCH == 0:
+            RENDERS.check(generation)
+        pos = positions[idx]
+        lat_f = float(cells.lat[pos])
+        lon_f = float(cells.lon[pos])
+        band_info = cells.band_info(pos)
         band_key = band_info["key"] if band_info else "2600"
         band_label = band_info["label"] if band_info else "Unknown"
-
-        az = row.get(mapping.get("azimuth", ""), "0")
-        try:
-            az_f = float(az)
-        except ValueError:
-            az_f = 0.0
-
-        beam = row.get(mapping.get("beamwidth", ""), "")
-        try:
-            beam_f = float(beam)
-        except ValueError:
-            beam_f = earfcn_utils.calculate_beamwidth(earfcn, beamwidth_overrides)
-
-        radius = earfcn_utils.calculate_petal_radius(earfcn, scale, band_scale_overrides)
-        coords = geometry.generate_petal(lat_f, lon_f, az_f, beam_f, radius)
-        polygon = [[c[1], c[0]] for c in coords]
+        polygon = [[c[1], c[0]] for c in vertices[idx, : counts[idx]].tolist()]
 
         site_label_field = label_config.site_field or mapping.get("site_name", "")
         site_label = build_label(row, site_label_field, label_config.template)
@@ -526,9 +1748,7 @@ async def map_data():
                 field = mapping.get("site_name", "")
             cell_label = build_label(row, field, "")
 
-        popup_html = _build_popup_html(row, mapping, extra_fields)
-
-        cells.append(
+        cells_out.append(
             {
                 "cell_name": row.get(mapping.get("cell_name", ""), ""),
                 "site_name": row.get(mapping.get("site_name", ""), ""),
@@ -538,7 +1758,7 @@ async def map_data():
                 "band_label": band_label,
                 "color": _get_band_color_hex(band_key),
                 "polygon": polygon,
-                "popup": popup_html,
+                "row_id": cells.row_ids[pos].item(),
                 "cell_label": cell_label,
             }
         )
@@ -552,67 +1772,231 @@ async def map_data():
                     "lon": lon_f,
                 }
 
+    payload = {"cells": cells_out, "sites": list(sites.values())}
+    return FastJSONResponse(_map_response(cells, label_config, loaded_bbox, zoom, payload))
+
+
+@app.get("/api/map-data")
+async def map_data(
+    request: Request,
+    bbox: Optional[str] = None,
+    zoom: Optional[int] = None,
+    compact: bool = False,
+    stream: bool = False,
+):
+    # Clients that accept the binary column format get it (always compact, framed records when
+    # streamed); JSON otherwise
+    binary = MAP_BINARY_MEDIA_TYPE in request.headers.get("accept", "")
+    state = _snapshot()
+    etag = _response_etag(state, "map-data", bbox, zoom, compact, stream, binary)
+    generation = state["generation"]
+    try:
+        response = await _memoized_response(
+            request, etag, lambda: _build_map_data(state, bbox, zoom, compact, stream, binary), generation
+        )
+    except RenderSuperseded:
+        raise HTTPException(status_code=409, detail="Superseded by a newer map configuration.")
+    # Not part of the memoized body: Live mode subscribes to the changes made after this generation
+    response.headers["X-Live-Version"] = str(generation)
+    return response
+
+
+@app.get("/api/live/events")
+async def live_events(since: int, bbox: Optional[str] = None):
+    """Server-Sent Events: the sector changes (see LiveChannel) made after generation `since`.
+
+    `since` is the X-Live-Version of the map data the client drew and `bbox`
+    the area it loaded ("west,south,east,north"); rows outside it are not sent.
+    A {"reload": true} message asks the client to fetch the map data again.
+    """
+    view = _parse_bbox(bbox) if bbox else None
+
+    async def events():
+        await run_cpu_bound(_attach_live)
+        try:
+            version = since
+            idle = 0.0
+            while True:
+                if LIVE.version != version:
+                    chain = LIVE.since(version) or [{"version": LIVE.version, "reload": True}]
+                    for diff in chain:
+                        event = await run_cpu_bound(_live_event, diff, view)
+                        yield f"data: {event.decode('utf-8')}\n\n"
+                    version = chain[-1]["version"]
+                    idle = 0.0
+                elif idle >= LIVE_KEEPALIVE_SECONDS:
+                    yield ": keep-alive\n\n"
+                    idle = 0.0
+                await asyncio.sleep(LIVE_POLL_INTERVAL)
+                idle += LIVE_POLL_INTERVAL
+        finally:
+            LIVE.detach()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+def _cell_popups(row_ids: List[int]) -> List[Dict[str, Any]]:
+    """Popup HTML of the sectors with the given row ids; unknown ids are skipped."""
+    cells = _get_cells()
+    mapping = CURRENT.get("mapping", {})
+    extra_fields = CURRENT.get("extra_fields", [])
+    positions = cells.locate(row_ids)
+    found = positions >= 0
+    results = []
+    for row_id, pos, row in zip(np.asarray(row_ids)[found].tolist(), positions[found], cells.records(positions[found])):
+        band_info = cells.band_info(pos)
+        band_label = band_info["label"] if band_info else "Unknown"
+        results.append({"row_id": row_id, "popup": _build_popup_html(row, mapping, extra_fields, band_label)})
+    return results
+
+
+@app.get("/api/cell/{row_id}")
+@cpu_bound
+def cell_popup(row_id: int):
+    """Popup of one sector, by the row id sent with the map data."""
+    results = _cell_popups([row_id])
+    if not results:
+        raise HTTPException(status_code=404, detail="Sector not found.")
+    return results[0]
+
+
+@app.post("/api/cells")
+@cpu_bound
+def cell_popups(payload: Dict[str, Any] = Body(...)):
+    row_ids = payload.get("row_ids", [])
+    if not isinstance(row_ids, list) or len(row_ids) > CELL_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"row_ids must be a list of at most {CELL_BATCH_MAX} ids.")
+    try:
+        row_ids = [int(row_id) for row_id in row_ids]
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="row_ids must be integers.")
+    return {"cells": _cell_popups(row_ids)}
+
+
+@app.get("/api/tiles/{z}/{x}/{y}")
+@render_bound
+def map_tile(z: int, x: int, y: int):
+    """Petals (or clusters at low zoom) of one XYZ tile as compact GeoJSON."""
+    # The key and the tile come from the same snapshot, so a tile is never cached under a newer config
+    state = _snapshot()
+    mapping = state.get("mapping", {})
+    if not mapping.get("latitude") or not mapping.get("longitude"):
+        raise HTTPException(status_code=400, detail="Mapping must include latitude and longitude.")
+    if not 0 <= z <= TILE_MAX_ZOOM or not 0 <= x < 2**z or not 0 <= y < 2**z:
+        raise HTTPException(status_code=400, detail="Tile out of range.")
+
+    key = (state["data_version"], _config_hash(state), z, x, y)
+    body = TILE_CACHE.get(key)
+    status = "HIT"
+    if body is None:
+        status = "MISS"
+        body = dumps_json(_build_tile(state, z, x, y))
+        TILE_CACHE.put(key, body)
+    return Response(body, media_type="application/geo+json", headers={"X-Cache": status})
+
+
+@app.get("/api/memory")
+@cpu_bound
+def memory_report():
+    """Bytes held per dataset: the loaded table, the filtered view's own rows, the parsed cell columns."""
+    df_full = CURRENT.get("df_full")
+    if df_full is None:
+        raise HTTPException(status_code=400, detail="No data loaded.")
+    df, rows = CURRENT["df"], CURRENT.get("rows")
+    # A filtered view holds its row positions; its rows are only taken (per-row codes and references,
+    # sharing categories and strings with df_full) once an endpoint needs them as a DataFrame
+    taken = rows is not None and df is not None
+    taken_bytes = int(df.memory_usage(index=True, deep=False).sum()) if taken else 0
+    view_bytes = 0 if rows is None else rows.nbytes + taken_bytes
+    cells_full, cells = CURRENT.get("cells_full"), CURRENT.get("cells")
+    parsed = {}
+    if cells_full is not None:
+        parsed["full"] = {"rows": len(cells_full), "bytes": cells_full.nbytes}
+    if cells is not None and cells is not cells_full:
+        parsed["view"] = {"rows": len(cells), "bytes": cells.nbytes}
     return {
-        "cells": cells,
-        "sites": list(sites.values()),
-        "label_config": {
-            "show_label": label_config.show_label,
-            "text_scale": label_config.text_scale,
-            "text_color": f"#{label_config.text_color}",
-            "shadow": label_config.shadow,
-            "position": label_config.position,
+        "full": {"rows": len(df_full), "columns": len(df_full.columns), **CURRENT["meta"].get("memory", {})},
+        "view": {
+            "rows": len(df_full) if rows is None else len(rows),
+            "filtered": rows is not None,
+            "bytes": view_bytes,
+            "taken": taken,
+            "taken_bytes": taken_bytes,
         },
+        "cells": parsed,
+    }
+
+
+@app.get("/api/cache-stats")
+async def cache_stats():
+    return {
+        "petals": PETAL_CACHE.stats(),
+        "tiles": TILE_CACHE.stats(),
+        "responses": RESPONSE_CACHE.stats(),
+        "renders": RENDERS.stats(),
+        "live": LIVE.stats(),
     }
 
 
 @app.post("/api/generate-kml")
-async def generate_kml_endpoint():
-    df = _require_df()
-    mapping = CURRENT.get("mapping", {})
-    label_config: LabelConfig = CURRENT.get("label_config")
-    extra_fields = CURRENT.get("extra_fields", [])
-    scale = CURRENT.get("scale", 1.0)
-    band_scale_overrides = CURRENT.get("band_scale_overrides", {})
-    beamwidth_overrides = CURRENT.get("beamwidth_overrides", {})
+async def generate_kml_endpoint(request: Request, output: str = "kml", compression: int = config.KMZ_COMPRESSION_LEVEL):
+    state = _snapshot()
+    mapping = state.get("mapping", {})
+    label_config: LabelConfig = state.get("label_config")
+    extra_fields = state.get("extra_fields", [])
+    scale = state.get("scale", 1.0)
+    band_scale_overrides = state.get("band_scale_overrides", {})
+    beamwidth_overrides = state.get("beamwidth_overrides", {})
 
     if not mapping:
         raise HTTPException(status_code=400, detail="Mapping not set.")
+    if output not in ("kml", "kmz"):
+        raise HTTPException(status_code=400, detail="Output must be 'kml' or 'kmz'.")
+    if not 0 <= compression <= 9:
+        raise HTTPException(status_code=400, detail="Compression level must be between 0 and 9.")
+
+    today = datetime.date.today().isoformat()
+
+    def render() -> Response:
+        # Chunks are produced as the response is sent, one band folder at a time
+        # The rows are read through the cells, so a filtered view is never taken as a whole
+        kml_chunks = kml_generator.iter_kml(
+            None,
+            mapping,
+            label_config,
+            extra_fields,
+            scale,
+            band_scale_overrides,
+            beamwidth_overrides,
+            cells=_get_cells(state=state),
+        )
 
-    kml_bytes = kml_generator.generate_kml(
-        df,
-        mapping,
-        label_config,
-        extra_fields,
-        scale,
-        band_scale_overrides,
-        beamwidth_overrides,
-    )
-
-    filename = f"cell_sites_{datetime.date.today().isoformat()}.kml"
-    headers = {"Content-Disposition": f"attachment; filename={filename}"}
-    return StreamingResponse(iter([kml_bytes]), media_type="application/vnd.google-earth.kml+xml", headers=headers)
+        filename = f"cell_sites_{today}.{output}"
+        headers = {"Content-Disposition": f"attachment; filename={filename}"}
+        if output == "kmz":
+            kmz_chunks = iterate_cpu_bound(kml_generator.iter_kmz(kml_chunks, compression))
+            return StreamingResponse(kmz_chunks, media_type=KMZ_MEDIA_TYPE, headers={**headers, **NO_GZIP_HEADERS})
+        kml_chunks = iterate_cpu_bound(kml_chunks)
+        return StreamingResponse(kml_chunks, media_type="application/vnd.google-earth.kml+xml", headers=headers)
 
+    # Exports are streamed, not kept in memory: an unchanged one (same data, settings and day) only gets a 304
+    etag = _response_etag(state, "kml", output, compression, today)
+    return await _memoized_response(request, etag, render, memoize=False)
 
-@app.post("/api/export-report")
-async def export_report():
-    df = _require_df()
-    mapping = CURRENT.get("mapping", {})
 
-    lat_col = mapping.get("latitude")
-    lon_col = mapping.get("longitude")
+def _build_report(cells: CellFrame, mapping: Dict[str, str]) -> bytes:
     site_col = mapping.get("site_name")
-    cell_col = mapping.get("cell_name")
     earfcn_col = mapping.get("earfcn")
 
-    total_cells = len(df)
-    total_sites = len(set(df[site_col])) if site_col else 0
+    total_cells = len(cells)
+    total_sites = len(set(cells.column(site_col))) if site_col else 0
 
     band_counts: Dict[str, int] = {}
     if earfcn_col:
-        for value in df[earfcn_col].tolist():
-            band_info = earfcn_utils.get_band_info(value)
-            label = band_info["label"] if band_info else "Unknown"
-            band_counts[label] = band_counts.get(label, 0) + 1
+        band_index = cells.band_index
+        labels = [info["label"] for info in config.BAND_RANGES] + ["Unknown"]
+        for idx, count in zip(*np.unique(band_index, return_counts=True)):
+            band_counts[labels[idx]] = int(count)
 
     lines = [
         "MoB_KML - Report",
@@ -628,12 +2012,232 @@ async def export_report():
     for band_label, count in sorted(band_counts.items()):
         lines.append(f"- {band_label}: {count}")
 
-    content = "\n".join(lines).encode("utf-8")
+    return "\n".join(lines).encode("utf-8")
+
+
+@app.post("/api/export-report")
+@cpu_bound
+def export_report():
+    mapping = CURRENT.get("mapping", {})
+    content = _build_report(_get_cells(), mapping)
     filename = f"report_{datetime.date.today().isoformat()}.txt"
     headers = {"Content-Disposition": f"attachment; filename={filename}"}
     return StreamingResponse(iter([content]), media_type="text/plain", headers=headers)
 
 
+def _jobs_dir() -> str:
+    with RUNTIME_LOCK:
+        if RUNTIME["jobs_dir"] is None:
+            RUNTIME["jobs_dir"] = tempfile.mkdtemp(prefix="mob_kml_jobs_")
+        return RUNTIME["jobs_dir"]
+
+
+def _remove_artifact(job: ExportJob) -> None:
+    if job.path:
+        try:
+            os.remove(job.path)
+        except OSError:
+            pass
+        job.path = None
+
+
+def _cleanup_jobs(now_ts: Optional[float] = None) -> None:
+    """Forget finished jobs older than JOB_TTL_SECONDS and delete their files."""
+    now_ts = time.time() if now_ts is None else now_ts
+    with JOBS_LOCK:
+        expired = [job for job in JOBS.values() if job.finished and now_ts - job.finished > JOB_TTL_SECONDS]
+        for job in expired:
+            del JOBS[job.id]
+    for job in expired:
+        _remove_artifact(job)
+
+
+def _shutdown_jobs() -> None:
+    """Cancel the pending exports and remove the jobs directory with every artifact in it."""
+    with JOBS_LOCK:
+        jobs = list(JOBS.values())
+        JOBS.clear()
+    for job in jobs:
+        job.cancel.set()
+    deadline = time.monotonic() + JOB_SHUTDOWN_WAIT_SECONDS
+    while any(job.status == "running" for job in jobs) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    with RUNTIME_LOCK:
+        jobs_dir, RUNTIME["jobs_dir"] = RUNTIME["jobs_dir"], None
+    if jobs_dir:
+        shutil.rmtree(jobs_dir, ignore_errors=True)
+
+
+def _get_job(job_id: str) -> ExportJob:
+    _cleanup_jobs()
+    job = JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
+def _run_job(job: ExportJob, write: Callable[[ExportJob, Any], None]) -> None:
+    """Job body: `write(job, handle)` produces the artifact into the job's file."""
+    if job.cancel.is_set():
+        job.status = "cancelled"
+        job.finished = time.time()
+        return
+    job.status = "running"
+    job.started = time.time()
+    path = os.path.join(_jobs_dir(), f"{job.id}_{job.filename}")
+    try:
+        with open(path, "wb") as handle:
+            write(job, handle)
+        job.path = path
+        job.size = os.path.getsize(path)
+        job.status = "done"
+    except JobCancelled:
+        job.status = "cancelled"
+    except Exception as exc:
+        job.status = "failed"
+        job.error = str(exc)
+    finally:
+        job.finished = time.time()
+        if job.status != "done":
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _submit_job(
+    kind: str, filename: str, media_type: str, rows_total: int, write: Callable[[ExportJob, Any], None]
+) -> ExportJob:
+    _cleanup_jobs()
+    job_id = uuid.uuid4().hex[:12]
+    job = ExportJob(id=job_id, kind=kind, filename=filename, media_type=media_type, rows_total=rows_total)
+    with JOBS_LOCK:
+        JOBS[job.id] = job
+    JOB_EXECUTOR.submit(_run_job, job, write)
+    return job
+
+
+def _job_cells(payload: Dict[str, Any]) -> CellFrame:
+    """Dataset of a job: the current one, or `filters` applied to the full upload (rows read lazily)."""
+    state = _snapshot()
+    filters = payload.get("filters")
+    if filters is None:
+        return _get_cells(state=state)
+    if not isinstance(filters, dict):
+        raise HTTPException(status_code=400, detail="filters must map column names to value lists.")
+    df_full = state["df_full"]
+    rows = _filter_rows(df_full, filters)
+    return _view_cells(None if rows is not None else df_full, rows, df_full, state.get("mapping", {}))
+
+
+@app.post("/api/jobs/kml")
+@cpu_bound
+def create_kml_job(payload: Dict[str, Any] = Body(default={})):
+    """Start a KML/KMZ export in the background; the settings and data are taken now."""
+    mapping = CURRENT.get("mapping", {})
+    output = payload.get("output", "kml")
+    try:
+        compression = int(payload.get("compression", config.KMZ_COMPRESSION_LEVEL))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Compression level must be between 0 and 9.")
+    _require_data()
+    if not mapping:
+        raise HTTPException(status_code=400, detail="Mapping not set.")
+    if output not in ("kml", "kmz"):
+        raise HTTPException(status_code=400, detail="Output must be 'kml' or 'kmz'.")
+    if not 0 <= compression <= 9:
+        raise HTTPException(status_code=400, detail="Compression level must be between 0 and 9.")
+
+    cells = _job_cells(payload)
+    settings = (
+        mapping,
+        CURRENT.get("label_config"),
+        CURRENT.get("extra_fields", []),
+        CURRENT.get("scale", 1.0),
+        CURRENT.get("band_scale_overrides", {}),
+        CURRENT.get("beamwidth_overrides", {}),
+    )
+
+    def write(job: ExportJob, handle: Any) -> None:
+        chunks = kml_generator.iter_kml(None, *settings, cells=cells, progress=job.advance)
+        if output == "kmz":
+            chunks = kml_generator.iter_kmz(chunks, compression)
+        try:
+            for chunk in chunks:
+                handle.write(chunk)
+        finally:
+            chunks.close()
+
+    filename = f"cell_sites_{datetime.date.today().isoformat()}.{output}"
+    media_type = KMZ_MEDIA_TYPE if output == "kmz" else "application/vnd.google-earth.kml+xml"
+    return _submit_job("kml", filename, media_type, len(cells.positions), write).snapshot()
+
+
+@app.post("/api/jobs/report")
+@cpu_bound
+def create_report_job(payload: Dict[str, Any] = Body(default={})):
+    mapping = CURRENT.get("mapping", {})
+    _require_data()
+    if not mapping:
+        raise HTTPException(status_code=400, detail="Mapping not set.")
+    cells = _job_cells(payload)
+
+    def write(job: ExportJob, handle: Any) -> None:
+        handle.write(_build_report(cells, mapping))
+        job.advance(len(cells))
+
+    filename = f"report_{datetime.date.today().isoformat()}.txt"
+    return _submit_job("report", filename, "text/plain", len(cells), write).snapshot()
+
+
+@app.get("/api/jobs")
+async def list_jobs():
+    _cleanup_jobs()
+    return {"jobs": [job.snapshot() for job in list(JOBS.values())]}
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    return _get_job(job_id).snapshot()
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-Sent Events: the job state every JOB_EVENT_INTERVAL seconds until it finishes."""
+    job = _get_job(job_id)
+
+    async def events():
+        while True:
+            state = job.snapshot()
+            yield f"data: {dumps_json(state).decode('utf-8')}\n\n"
+            if state["status"] in JOB_FINISHED:
+                return
+            await asyncio.sleep(JOB_EVENT_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/api/jobs/{job_id}/download")
+async def download_job(job_id: str):
+    job = _get_job(job_id)
+    if job.status != "done" or not job.path:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}.")
+    headers = NO_GZIP_HEADERS if job.media_type == KMZ_MEDIA_TYPE else None
+    return FileResponse(job.path, media_type=job.media_type, filename=job.filename, headers=headers)
+
+
+@app.delete("/api/jobs/{job_id}")
+async def delete_job(job_id: str):
+    """Cancel a queued or running job; a finished job is removed with its file."""
+    job = _get_job(job_id)
+    job.cancel.set()
+    if job.status in JOB_FINISHED:
+        with JOBS_LOCK:
+            JOBS.pop(job.id, None)
+        _remove_artifact(job)
+    return job.snapshot()
+
+
 @app.post("/api/calculate-distance")
 async def calculate_distance(payload: Dict[str, Any] = Body(...)):
     """
@@ -689,9 +2293,12 @@ async def load_profile(payload: Dict[str, Any] = Body(...)):
     name = payload.get("name", "").strip()
     if not name:
         raise HTTPException(status_code=400, detail="Profile name is required.")
-    path = os.path.join(PROFILES_DIR, name)
+    return {"data": _read_profile(name)}
+
+
+def _read_profile(name: str) -> Dict[str, Any]:
+    path = os.path.join(PROFILES_DIR, os.path.basename(name))
     if not os.path.isfile(path):
         raise HTTPException(status_code=404, detail="Profile not found.")
     with open(path, "r", encoding="utf-8") as handle:
-        data = json.load(handle)
-    return {"data": data}
+        return json.load(handle)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Serialization cost of /api/map-data payloads on a synthetic inventory.
+
+Compares FastAPI's default path (jsonable_encoder + json.dumps) with
+dumps_json (orjson when installed), the binary column format and gzip.
+
+Usage: python benchmarks/bench_serialization.py [n_cells]
+"""
+
+import gzip
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import main  # noqa: E402
+
+EARFCNS = ["9310", "2450", "3500", "1300", "100", "3000", "38000", "39000", "40000", "42000", "44000", "630000", ""]
+
+
+def write_inventory(path, n_cells, seed=1):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as handle:
+        handle.write("SiteID;CellName;Latitude;Longitude;EARFCN;Azimuth;UF;Municipio;Vendor\n")
+        for i in range(n_cells):
+            site = i // 3
+            lat = -23.5 + (site % 200) * 0.01 + rng.random() * 0.001
+            lon = -46.6 + (site // 200) * 0.01
+            handle.write(
+                "S%05d;S%05d_%d;%.6f;%.6f;%s;%d;SP;City%d;V%d\n"
+                % (site, site, i % 3, lat, lon, rng.choice(EARFCNS), (i % 3) * 120, site % 30, site % 3)
+            )
+
+
+def timed(label, func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    size = len(result) if isinstance(result, (bytes, str)) else 0
+    print("%-44s %8.3f s %12s bytes" % (label, best, "{:,}".format(size)))
+    return result
+
+
+def main_bench(n_cells):
+    # Keep the synthetic upload out of the user's ingest cache (and measure a real parse)
+    main.INGEST_CACHE.max_bytes = 0
+    client = TestClient(main.app)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "inventory.csv")
+        write_inventory(path, n_cells)
+        with open(path, "rb") as handle:
+            client.post("/api/upload", files={"file": ("inventory.csv", handle)})
+    mapping = client.post("/api/auto-map").json()["mapping"]
+    client.post("/api/set-config", json={"mapping": mapping, "extra_fields": ["Vendor"]})
+
+    full = json.loads(client.get("/api/map-data").content)
+    cells = main._get_cells()
+    compact = main._compact_map_payload(
+        cells,
+        cells.positions,
+        main.CURRENT["mapping"],
+        main.CURRENT["label_config"],
+        main.CURRENT["scale"],
+        main.CURRENT["band_scale_overrides"],
+        main.CURRENT["beamwidth_overrides"],
+    )
+
+    print("cells: %d   orjson: %s" % (len(full["cells"]), "yes" if main.orjson is not None else "no"))
+    print("-- full payload (petal polygons and labels, popups fetched separately)")
+    timed("jsonable_encoder + json.dumps (before)", lambda: json.dumps(jsonable_encoder(full)).encode("utf-8"), 1)
+    body = timed("dumps_json", lambda: main.dumps_json(full))
+    if main.orjson is not None:
+        fast, main.orjson = main.orjson, None
+        timed("dumps_json without orjson", lambda: main.dumps_json(full), 1)
+        main.orjson = fast
+    timed("gzip level %d" % main.GZIP_LEVEL, lambda: gzip.compress(body, compresslevel=main.GZIP_LEVEL), 1)
+
+    print("-- compact payload (sector columns)")
+    body = timed("dumps_json", lambda: main.dumps_json(compact))
+    timed("gzip level %d" % main.GZIP_LEVEL, lambda: gzip.compress(body, compresslevel=main.GZIP_LEVEL), 1)
+    body = timed("binary columns", lambda: main._encode_columns(compact))
+    timed("gzip level %d" % main.GZIP_LEVEL, lambda: gzip.compress(body, compresslevel=main.GZIP_LEVEL), 1)
+
+
+if __name__ == "__main__":
+    main_bench(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Reading large .xlsx inventories: pd.read_excel versus xlsx_reader.read_xlsx.
+
+Writes synthetic workbooks (one sheet, and the same rows split over three
+sheets), checks that both readers return the same text table and reports the
+best time and the peak Python memory (tracemalloc) of each.
+
+Usage: python benchmarks/bench_xlsx.py [n_rows] [n_kpi_columns]
+"""
+
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import openpyxl  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from cell_kml_generator.xlsx_reader import read_xlsx  # noqa: E402
+
+EARFCNS = [9310, 2450, 3500, 1300, 100, 3000, 38000, 39000, 40000, 42000, 44000, 630000, None]
+HEADER = ["SiteID", "CellName", "Latitude", "Longitude", "EARFCN", "Azimuth", "UF", "Municipio", "Vendor", "Updated"]
+
+
+def write_workbook(path, n_rows, n_kpis, n_sheets=1, seed=1):
+    """Typed cells as exported by planning tools: text, int and float numbers, dates, blanks."""
+    rng = random.Random(seed)
+    workbook = openpyxl.Workbook(write_only=True)
+    header = HEADER + ["KPI%d" % k for k in range(n_kpis)]
+    per_sheet = -(-n_rows // n_sheets)
+    sheet = None
+    for i in range(n_rows):
+        if i % per_sheet == 0:
+            sheet = workbook.create_sheet("Sheet%d" % (i // per_sheet + 1))
+            sheet.append(header)
+        site = i // 3
+        row = [
+            "S%05d" % site,
+            "S%05d_%d" % (site, i % 3),
+            -23.5 + (site % 200) * 0.01 + rng.random() * 0.001,
+            -46.6 + (site // 200) * 0.01,
+            rng.choice(EARFCNS),
+            (i % 3) * 120,
+            "SP",
+            "City%d" % (site % 30),
+            "V%d" % (site % 3),
+            datetime.datetime(2024, 1, 1) + datetime.timedelta(days=site % 365),
+        ]
+        row += [round(rng.random() * 100, 2) for _ in range(n_kpis)]
+        sheet.append(row)
+    workbook.save(path)
+
+
+def read_excel_before(path, sheet_names):
+    """The previous load_file path (all sheets concatenated for the multi-sheet case)."""
+    frames = pd.read_excel(path, sheet_name=sheet_names, dtype=str)
+    return pd.concat(frames.values(), ignore_index=True).fillna("")
+
+
+def measure(label, func, repeat=2):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("%-44s %8.3f s %10.1f MB peak" % (label, best, peak / 1e6))
+    return result
+
+
+def main_bench(n_rows, n_kpis):
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_sheets in (1, 3):
+            path = os.path.join(tmp, "inventory_%d.xlsx" % n_sheets)
+            write_workbook(path, n_rows, n_kpis, n_sheets)
+            sheet_names = ["Sheet%d" % (k + 1) for k in range(n_sheets)]
+            print(
+                "-- %d rows x %d columns, %d sheet(s), %.1f MB"
+                % (n_rows, len(HEADER) + n_kpis, n_sheets, os.path.getsize(path) / 1e6)
+            )
+            before = measure("pd.read_excel(dtype=str) (before)", lambda: read_excel_before(path, sheet_names))
+            after, _ = measure("read_xlsx (streaming)", lambda: read_xlsx(path, sheet="*"))
+            measure(
+                "read_xlsx, 5 columns kept",
+                lambda: read_xlsx(path, sheet="*", usecols=HEADER[:4] + ["EARFCN"]),
+            )
+            print("same table: %s" % before.astype(str).equals(after))
+
+
+if __name__ == "__main__":
+    main_bench(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 20,
+    )
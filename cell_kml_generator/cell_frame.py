@@ -0,0 +1,334 @@
+import itertools
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .config import BAND_RANGES, PETAL_CACHE_BYTES
+from .earfcn_utils import calculate_beamwidths, calculate_petal_radii, classify_band_indexes
+from .geometry import generate_petals
+from .lru_cache import LRUCache
+from .spatial_index import ClusterPyramid, GridIndex
+
+
+class _BandPetals:
+    """Petal vertices of the rows of one band, computed as rows are asked for (count -1: not yet)."""
+
+    def __init__(self, size):
+        self.vertices = np.empty((size, 0, 2), dtype=np.float64)
+        self.counts = np.full(size, -1, dtype=np.int64)
+        self.lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return self.vertices.nbytes + self.counts.nbytes
+
+    def fill(self, rows, vertices, counts):
+        # Rows are as wide as the widest petal computed so far, NaN-padded
+        width = int(counts.max())
+        if width > self.vertices.shape[1]:
+            grown = np.full((len(self.counts), width, 2), np.nan, dtype=np.float64)
+            grown[:, : self.vertices.shape[1]] = self.vertices
+            self.vertices = grown
+        self.vertices[rows, :width] = vertices[:, :width]
+        self.counts[rows] = counts
+
+
+# Petal vertices per (frame, band, radius, band beamwidth, points), shared by map data,
+# tiles and KML. Only the rows asked for are computed; a config change only recomputes
+# the bands whose geometry changed.
+PETAL_CACHE = LRUCache(max_bytes=PETAL_CACHE_BYTES, sizeof=lambda entry: entry.nbytes)
+_FRAME_IDS = itertools.count(1)
+
+
+def _column(df, column):
+    if column and column in df.columns:
+        return df[column]
+    return pd.Series("", index=df.index, dtype=object)
+
+
+def _per_category(series, parse, missing):
+    """`parse` applied to a column; a categorical one is parsed once per category, not once per row."""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return parse(series)
+    parsed = parse(pd.Series(series.cat.categories))
+    # Code -1 (missing value) picks the appended `missing`
+    parsed = np.append(parsed, np.array([missing], dtype=parsed.dtype))
+    return parsed[series.cat.codes.to_numpy()]
+
+
+def _parse_float(series):
+    values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+    values[~np.isfinite(values)] = np.nan
+    return values
+
+
+def _to_float(series):
+    """Parse a text column to float64; empty and invalid values become NaN."""
+    return _per_category(series, _parse_float, np.nan)
+
+
+@dataclass
+class CellFrame:
+    """Typed, columnar view of the mapped inventory.
+
+    Built once per (DataFrame, mapping) pair so the map, KML, search and report
+    paths do not re-parse coordinate/azimuth/EARFCN strings on every request.
+    Arrays are aligned with the rows of `df`; `row_ids` are the DataFrame index
+    labels, which stay stable when `df` is a filtered view of the full inventory.
+    A view made by take(cache=True) only holds its row positions in the parent
+    frame: records and columns are read from it, and `df` is taken on first use.
+    """
+
+    mapping: Dict[str, str]
+    row_ids: np.ndarray
+    lat: np.ndarray
+    lon: np.ndarray
+    azimuth: np.ndarray
+    beamwidth: np.ndarray
+    earfcn: np.ndarray
+    band_index: np.ndarray
+    valid: np.ndarray
+    _positions: Any = field(default=None, repr=False)
+    _grid: Any = field(default=None, repr=False)
+    _clusters: Any = field(default=None, repr=False)
+    _band_positions: Dict[int, np.ndarray] = field(default_factory=dict, repr=False)
+    # Identifies this frame in PETAL_CACHE; None (e.g. worker shards) disables caching
+    cache_id: Optional[int] = None
+    # The source rows, or None for a lazy view: the rows `_source_rows` (ascending) of `_source`
+    _df: Optional[pd.DataFrame] = field(default=None, repr=False)
+    _source: Optional[pd.DataFrame] = field(default=None, repr=False)
+    _source_rows: Optional[np.ndarray] = field(default=None, repr=False)
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    @property
+    def df(self):
+        """Source rows of the cells; a lazy view takes them from its parent frame on first use."""
+        if self._df is None:
+            self._df = self._source.take(self._source_rows)
+        return self._df
+
+    @property
+    def columns(self):
+        return self.df.columns if self._df is not None else self._source.columns
+
+    def _frame_rows(self, positions):
+        """Source rows at `positions`, read from the parent frame when the view was not taken."""
+        if self._df is None:
+            return self._source.iloc[self._source_rows[positions]]
+        return self._df.iloc[positions]
+
+    def column(self, column):
+        """Values of `column` for every row (empty strings when it is not a column)."""
+        if self._df is not None:
+            return _column(self._df, column)
+        if column and column in self._source.columns:
+            return self._source[column].take(self._source_rows)
+        return pd.Series("", index=self._source.index[self._source_rows], dtype=object)
+
+    def column_values(self, column, positions):
+        """Raw values of `column` at `positions` (as row.get(column, "") would give them)."""
+        if not column or column not in self.columns:
+            return [""] * len(positions)
+        if self._df is None:
+            return self._source[column].iloc[self._source_rows[positions]].tolist()
+        return self._df[column].iloc[positions].tolist()
+
+    @property
+    def positions(self):
+        """Positions (0..n-1) of the rows with valid coordinates."""
+        if self._positions is None:
+            self._positions = np.flatnonzero(self.valid)
+        return self._positions
+
+    @property
+    def grid(self):
+        """Spatial index over the site coordinates of the valid rows."""
+        if self._grid is None:
+            self._grid = GridIndex(self.lat, self.lon, self.positions)
+        return self._grid
+
+    def in_bbox(self, south, west, north, east):
+        """Positions of the valid rows whose site lies inside the box, ascending."""
+        return self.grid.query(south, west, north, east)
+
+    @property
+    def clusters(self):
+        """Per-zoom site clusters of the valid rows; band mix columns follow BAND_RANGES, then unknown."""
+        if self._clusters is None:
+            band_index = np.where(self.band_index >= 0, self.band_index, len(BAND_RANGES))
+            self._clusters = ClusterPyramid(self.lat, self.lon, band_index, len(BAND_RANGES) + 1, self.positions)
+        return self._clusters
+
+    @property
+    def nbytes(self):
+        """Bytes of the parsed columns (the DataFrame and the indexes are not counted)."""
+        arrays = (self.row_ids, self.lat, self.lon, self.azimuth, self.beamwidth, self.earfcn, self.band_index)
+        return sum(array.nbytes for array in arrays) + self.valid.nbytes
+
+    def take(self, positions, df=None, cache=False):
+        """CellFrame holding only the rows at `positions`.
+
+        Used for the shards of worker processes and, with `cache`, for filtered
+        views of the full inventory: those get their own PETAL_CACHE id and grid
+        index, and the parsed columns are reused rather than parsed again. `df`
+        is `self.df.iloc[positions]` when the caller already has it; without
+        it, a view keeps `positions` (ascending) instead of taking the rows.
+        Shards always hold their own rows, as they are sent to other processes.
+        """
+        lazy = df is None and cache
+        if df is None and not cache:
+            df = self._frame_rows(positions)
+        cells = CellFrame(
+            cache_id=next(_FRAME_IDS) if cache else None,
+            _df=df,
+            _source=(self._source if self._df is None else self._df) if lazy else None,
+            _source_rows=(positions if self._df is not None else self._source_rows[positions]) if lazy else None,
+            mapping=self.mapping,
+            row_ids=self.row_ids[positions],
+            lat=self.lat[positions],
+            lon=self.lon[positions],
+            azimuth=self.azimuth[positions],
+            beamwidth=self.beamwidth[positions],
+            earfcn=self.earfcn[positions],
+            band_index=self.band_index[positions],
+            valid=self.valid[positions],
+        )
+        if cache:
+            cells._grid = GridIndex(cells.lat, cells.lon, cells.positions)
+        return cells
+
+    def locate(self, row_ids):
+        """Positions of the rows with the given row ids (DataFrame index labels); -1 where absent."""
+        if self._df is not None:
+            return self._df.index.get_indexer(row_ids)
+        source_positions = self._source.index.get_indexer(row_ids)
+        positions = np.searchsorted(self._source_rows, source_positions)
+        found = (source_positions >= 0) & (positions < len(self._source_rows))
+        found[found] = self._source_rows[positions[found]] == source_positions[found]
+        return np.where(found, positions, -1)
+
+    def band_info(self, pos):
+        idx = int(self.band_index[pos])
+        return BAND_RANGES[idx] if idx >= 0 else None
+
+    def records(self, positions=None) -> List[Dict[str, Any]]:
+        """Source rows as dicts (usable by build_label and the description builders)."""
+        if positions is None:
+            positions = self.positions
+        return self._frame_rows(positions).to_dict("records")
+
+    def radii(self, scale=1.0, band_scale_overrides=None, positions=None):
+        band_index = self.band_index if positions is None else self.band_index[positions]
+        return calculate_petal_radii(band_index, scale, band_scale_overrides)
+
+    def beamwidths(self, beamwidth_overrides=None, positions=None):
+        """Mapped beamwidth where present, band beamwidth (with overrides) otherwise."""
+        band_index = self.band_index if positions is None else self.band_index[positions]
+        beam = self.beamwidth if positions is None else self.beamwidth[positions]
+        band_beams = calculate_beamwidths(band_index, beamwidth_overrides)
+        return np.where(np.isnan(beam), band_beams, beam)
+
+    def petals(self, scale=1.0, band_scale_overrides=None, beamwidth_overrides=None, positions=None, points=24):
+        """Petal vertices (see geometry.generate_petals) for `positions` (default: valid rows).
+
+        `positions` must be valid rows. Vertices are kept in PETAL_CACHE per band,
+        filled in as rows are asked for, so a viewport or tile only computes its
+        own rows, and only once until the band's radius or beamwidth changes.
+        """
+        if positions is None:
+            positions = self.positions
+        positions = np.asarray(positions)
+        if self.cache_id is None or not len(positions):
+            return self._compute_petals(positions, scale, band_scale_overrides, beamwidth_overrides, points)
+
+        bands = self.band_index[positions]
+        parts = []
+        for band in np.unique(bands).tolist():
+            selected = np.flatnonzero(bands == band)
+            band_vertices, band_counts = self._band_petals(
+                band, positions[selected], scale, band_scale_overrides, beamwidth_overrides, points
+            )
+            parts.append((selected, band_vertices, band_counts))
+
+        width = max(part[1].shape[1] for part in parts)
+        vertices = np.full((len(positions), width, 2), np.nan, dtype=np.float64)
+        counts = np.zeros(len(positions), dtype=parts[0][2].dtype)
+        for selected, band_vertices, band_counts in parts:
+            vertices[selected, : band_vertices.shape[1]] = band_vertices
+            counts[selected] = band_counts
+        return vertices, counts
+
+    def _compute_petals(self, positions, scale, band_scale_overrides, beamwidth_overrides, points):
+        return generate_petals(
+            self.lat[positions],
+            self.lon[positions],
+            self.azimuth[positions],
+            self.beamwidths(beamwidth_overrides, positions),
+            self.radii(scale, band_scale_overrides, positions),
+            points,
+        )
+
+    def _positions_of_band(self, band):
+        if band not in self._band_positions:
+            positions = self.positions
+            self._band_positions[band] = positions[self.band_index[positions] == band]
+        return self._band_positions[band]
+
+    def _band_petals(self, band, positions, scale, band_scale_overrides, beamwidth_overrides, points):
+        """Vertices and counts of `positions` (rows of `band`), computing the rows not cached yet."""
+        # Every row of a band shares its radius; rows without a mapped beamwidth share the band's
+        band_array = np.array([band], dtype=np.int16)
+        radius = int(calculate_petal_radii(band_array, scale, band_scale_overrides)[0])
+        beam = float(calculate_beamwidths(band_array, beamwidth_overrides)[0])
+        key = (self.cache_id, band, radius, beam, points)
+        band_positions = self._positions_of_band(band)
+        rows = np.searchsorted(band_positions, positions)
+        entry = PETAL_CACHE.get(key)
+        if entry is None:
+            entry = _BandPetals(len(band_positions))
+        with entry.lock:
+            missing = np.unique(rows[entry.counts[rows] < 0])
+            if len(missing):
+                vertices, counts = self._compute_petals(
+                    band_positions[missing], scale, band_scale_overrides, beamwidth_overrides, points
+                )
+                entry.fill(missing, vertices, counts)
+                # Put again: the entry grew
+                PETAL_CACHE.put(key, entry)
+            return entry.vertices[rows], entry.counts[rows]
+
+
+def build_cell_frame(df, mapping):
+    mapping = dict(mapping or {})
+    lat = _to_float(_column(df, mapping.get("latitude")))
+    lon = _to_float(_column(df, mapping.get("longitude")))
+    azimuth = _to_float(_column(df, mapping.get("azimuth")))
+    beamwidth = _to_float(_column(df, mapping.get("beamwidth")))
+
+    earfcn_text = _column(df, mapping.get("earfcn"))
+    band_index = _per_category(earfcn_text, classify_band_indexes, -1)
+    earfcn = _to_float(earfcn_text)
+    earfcn_ok = np.isfinite(earfcn) & (np.abs(earfcn) < 2**31)
+    earfcn = np.where(earfcn_ok, earfcn, -1).astype(np.int32)
+
+    cells = CellFrame(
+        cache_id=next(_FRAME_IDS),
+        _df=df,
+        mapping=mapping,
+        row_ids=df.index.to_numpy(),
+        lat=lat,
+        lon=lon,
+        azimuth=np.nan_to_num(azimuth, nan=0.0).astype(np.float32),
+        beamwidth=beamwidth.astype(np.float32),
+        earfcn=earfcn,
+        band_index=band_index,
+        valid=~(np.isnan(lat) | np.isnan(lon)),
+    )
+    # Index the sites up front, while the dataset is being prepared
+    cells._grid = GridIndex(lat, lon, cells.positions)
+    return cells
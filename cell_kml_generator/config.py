@@ -1,3 +1,5 @@
+import os
+
 APP_NAME = "Cell KML Generator"
 APP_VERSION = "1.0.0"
 
@@ -60,3 +62,26 @@ BAND_BEAMWIDTH = {
 DEFAULT_BEAMWIDTH = 65.0
 DEFAULT_LABEL_COLOR = "ffffff"
 DEFAULT_LABEL_SCALE = 1.0
+
+# KMZ output: zlib level 0 (store) .. 9 (smallest, slowest)
+KMZ_COMPRESSION_LEVEL = 6
+
+# KML rendering processes: 1 = serial, 0 = one per CPU (override with MOB_KML_WORKERS)
+KML_WORKERS = int(os.environ.get("MOB_KML_WORKERS", "1"))
+
+# Memory cap of the cached petal geometry (override with MOB_PETAL_CACHE_MB)
+PETAL_CACHE_BYTES = int(os.environ.get("MOB_PETAL_CACHE_MB", "256")) * 1024 * 1024
+
+# CSV/TXT files are parsed in blocks of this many rows (progress is reported per block)
+CSV_CHUNK_ROWS = 100_000
+
+# Text columns with at most this many distinct values per row (UF, regional, city, vendor,
+# EARFCN...) are kept as categoricals: one small integer code per row instead of a string
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+# On-disk cache of parsed uploads, keyed by file content (override with MOB_INGEST_CACHE_DIR /
+# MOB_INGEST_CACHE_MB; a size of 0 disables it)
+INGEST_CACHE_DIR = os.environ.get("MOB_INGEST_CACHE_DIR") or os.path.join(
+    os.path.expanduser("~"), ".mob_kml", "inventories"
+)
+INGEST_CACHE_BYTES = int(os.environ.get("MOB_INGEST_CACHE_MB", "2048")) * 1024 * 1024
@@ -1,5 +1,37 @@
+from bisect import bisect_right
+
+import numpy as np
+import pandas as pd
+
 from .config import BAND_RANGES, BAND_RADIUS_M, BAND_BEAMWIDTH, DEFAULT_BEAMWIDTH
 
+DEFAULT_RADIUS_M = 300
+
+
+def _compile_band_table(band_ranges):
+    """Sort the band ranges by their lower bound so lookups can bisect them.
+
+    `index` holds the position of each sorted range in `band_ranges`, which is
+    the band index returned by `classify_bands`.
+    """
+    order = sorted(range(len(band_ranges)), key=lambda i: band_ranges[i]["min"])
+    return {
+        "index": np.array(order, dtype=np.int16),
+        "min": np.array([band_ranges[i]["min"] for i in order], dtype=np.int64),
+        "max": np.array([band_ranges[i]["max"] for i in order], dtype=np.int64),
+    }
+
+
+BAND_TABLE = _compile_band_table(BAND_RANGES)
+_BAND_MINS = BAND_TABLE["min"].tolist()
+
+
+def _lookup_band_index(value):
+    pos = bisect_right(_BAND_MINS, value) - 1
+    if pos < 0 or value > BAND_TABLE["max"][pos]:
+        return -1
+    return int(BAND_TABLE["index"][pos])
+
 
 def get_band_info(earfcn):
     if earfcn is None:
@@ -8,23 +40,86 @@ def get_band_info(earfcn):
         value = int(earfcn)
     except (TypeError, ValueError):
         return None
-    for info in BAND_RANGES:
-        if info["min"] <= value <= info["max"]:
-            return info
-    return None
+    band_index = _lookup_band_index(value)
+    if band_index < 0:
+        return None
+    return BAND_RANGES[band_index]
+
+
+def classify_band_indexes(values):
+    """Return the BAND_RANGES index of every EARFCN in `values` (-1 when unknown).
+
+    Parsing follows `get_band_info`: text must be a plain integer, so empty,
+    non-numeric and decimal strings are reported as unknown.
+    """
+    values = pd.Series(values, copy=False)
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        numeric = np.trunc(values.to_numpy(dtype=np.float64, na_value=np.nan))
+    else:
+        text = values.astype(str)
+        is_int = text.str.fullmatch(r"\s*[+-]?\d+\s*").fillna(False).to_numpy(dtype=bool)
+        numeric = pd.to_numeric(text.where(is_int), errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = np.isfinite(numeric) & (np.abs(numeric) < 2**53)
+    earfcns = np.where(valid, numeric, -1).astype(np.int64)
+
+    pos = np.searchsorted(BAND_TABLE["min"], earfcns, side="right") - 1
+    in_table = valid & (pos >= 0)
+    pos = np.clip(pos, 0, None)
+    in_table &= earfcns <= BAND_TABLE["max"][pos]
+    return np.where(in_table, BAND_TABLE["index"][pos], -1).astype(np.int16)
+
+
+def classify_bands(series):
+    """Classify a whole EARFCN column in one pass.
+
+    Returns a DataFrame aligned with `series` with the columns band_index, key,
+    label, radius (default radius in meters) and beamwidth (default beamwidth).
+    Unknown values get band_index -1, a missing key/label and the generic defaults.
+    """
+    if not isinstance(series, pd.Series):
+        series = pd.Series(series)
+    band_index = classify_band_indexes(series)
+
+    keys = np.array([info["key"] for info in BAND_RANGES] + [None], dtype=object)
+    labels = np.array([info["label"] for info in BAND_RANGES] + [None], dtype=object)
+    radii = np.array([BAND_RADIUS_M.get(info["key"], DEFAULT_RADIUS_M) for info in BAND_RANGES] + [DEFAULT_RADIUS_M])
+    beams = np.array(
+        [BAND_BEAMWIDTH.get(info["key"], DEFAULT_BEAMWIDTH) for info in BAND_RANGES] + [DEFAULT_BEAMWIDTH],
+        dtype=np.float64,
+    )
+
+    # -1 picks the trailing "unknown" entry of every lookup array
+    return pd.DataFrame(
+        {
+            "band_index": band_index,
+            "key": keys[band_index],
+            "label": labels[band_index],
+            "radius": radii[band_index],
+            "beamwidth": beams[band_index],
+        },
+        index=series.index,
+    )
 
 
 def calculate_petal_radius(earfcn, scale=1.0, band_scale_overrides=None):
     band_info = get_band_info(earfcn)
     if not band_info:
-        return int(300 * scale)
+        return int(DEFAULT_RADIUS_M * scale)
     key = band_info["key"]
-    base = BAND_RADIUS_M.get(key, 300)
+    base = BAND_RADIUS_M.get(key, DEFAULT_RADIUS_M)
     if band_scale_overrides and key in band_scale_overrides:
         base = band_scale_overrides[key]
     return int(base * scale)
 
 
+def calculate_petal_radii(band_index, scale=1.0, band_scale_overrides=None):
+    """Array version of `calculate_petal_radius` working on band indexes."""
+    overrides = band_scale_overrides or {}
+    bases = [overrides.get(info["key"], BAND_RADIUS_M.get(info["key"], DEFAULT_RADIUS_M)) for info in BAND_RANGES]
+    bases = np.array(bases + [DEFAULT_RADIUS_M], dtype=np.float64)
+    return np.trunc(bases[np.asarray(band_index)] * scale).astype(np.int64)
+
+
 def calculate_beamwidth(earfcn, beamwidth_overrides=None):
     """Calculate beamwidth based on band frequency.
     Lower frequencies have wider beamwidth for better coverage visualization.
@@ -36,3 +131,11 @@ def calculate_beamwidth(earfcn, beamwidth_overrides=None):
     if beamwidth_overrides and key in beamwidth_overrides:
         return beamwidth_overrides[key]
     return BAND_BEAMWIDTH.get(key, DEFAULT_BEAMWIDTH)
+
+
+def calculate_beamwidths(band_index, beamwidth_overrides=None):
+    """Array version of `calculate_beamwidth` working on band indexes."""
+    overrides = beamwidth_overrides or {}
+    beams = [overrides.get(info["key"], BAND_BEAMWIDTH.get(info["key"], DEFAULT_BEAMWIDTH)) for info in BAND_RANGES]
+    beams = np.array(beams + [DEFAULT_BEAMWIDTH], dtype=np.float64)
+    return beams[np.asarray(band_index)]
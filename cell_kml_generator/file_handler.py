@@ -3,6 +3,12 @@ import os
 
 import pandas as pd
 
+from .config import CATEGORY_MAX_UNIQUE_RATIO, CSV_CHUNK_ROWS
+from .xlsx_reader import read_xlsx, read_xlsx_header, select_sheets
+
+# Rows looked at first to rule out near-unique columns (coordinates, cell names) cheaply
+CATEGORY_SAMPLE_ROWS = 10_000
+
 
 def detect_delimiter(sample_text):
     sniffer = csv.Sniffer()
@@ -16,22 +22,95 @@ def detect_delimiter(sample_text):
     return ","
 
 
-def load_file(path):
+def _csv_delimiter(path):
+    with open(path, "r", encoding="latin-1") as handle:
+        sample = "".join([handle.readline() for _ in range(5)])
+    return detect_delimiter(sample)
+
+
+def read_header(path, sheet=None):
+    """Column names of an inventory file as load_file would name them, without reading the rows."""
     _, ext = os.path.splitext(path.lower())
     if ext in [".csv", ".txt"]:
-        with open(path, "r", encoding="latin-1") as handle:
-            sample = "".join([handle.readline() for _ in range(5)])
-        delimiter = detect_delimiter(sample)
-        df = pd.read_csv(
-            path,
-            sep=delimiter,
-            dtype=str,
-            keep_default_na=False,
-            encoding="latin-1",
-        )
+        header = pd.read_csv(path, sep=_csv_delimiter(path), dtype=str, encoding="latin-1", nrows=0)
+        return list(header.columns)
+    if ext == ".xlsx":
+        return read_xlsx_header(path, sheet)
+    if ext == ".xls":
+        sheet_names = pd.ExcelFile(path).sheet_names
+        frames = pd.read_excel(path, sheet_name=select_sheets(sheet_names, sheet), dtype=str, nrows=0)
+        return list(dict.fromkeys(name for frame in frames.values() for name in frame.columns))
+    raise ValueError("Unsupported file type: %s" % ext)
+
+
+def load_file(path, usecols=None, progress=None, sheet=None):
+    """Read an inventory file with every value as text.
+
+    `usecols` (column names or a callable, as in pandas) limits the columns
+    that are materialized. CSV/TXT files are parsed in blocks of
+    CSV_CHUNK_ROWS rows; `progress(rows, bytes_read, bytes_total)` is called
+    after each block. For workbooks, `sheet` selects the sheets to read and
+    concatenate (see xlsx_reader.select_sheets); .xlsx files are streamed by
+    xlsx_reader.read_xlsx.
+    """
+    _, ext = os.path.splitext(path.lower())
+    total = os.path.getsize(path)
+    if ext in [".csv", ".txt"]:
+        delimiter = _csv_delimiter(path)
+        chunks = []
+        rows = 0
+        with open(path, "rb") as handle:
+            reader = pd.read_csv(
+                handle,
+                sep=delimiter,
+                dtype=str,
+                keep_default_na=False,
+                encoding="latin-1",
+                usecols=usecols,
+                chunksize=CSV_CHUNK_ROWS,
+            )
+            for chunk in reader:
+                chunks.append(chunk)
+                rows += len(chunk)
+                if progress:
+                    progress(rows, min(handle.tell(), total), total)
+        df = chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
         return df, {"delimiter": delimiter, "format": ext.lstrip(".")}
-    if ext in [".xlsx", ".xls"]:
-        df = pd.read_excel(path, dtype=str)
-        df = df.fillna("")
-        return df, {"format": ext.lstrip(".")}
+    if ext == ".xlsx":
+        df, sheet_names = read_xlsx(path, sheet, usecols, progress)
+        return df, {"format": "xlsx", "sheet_names": sheet_names}
+    if ext == ".xls":
+        sheet_names = pd.ExcelFile(path).sheet_names
+        frames = pd.read_excel(path, sheet_name=select_sheets(sheet_names, sheet), dtype=str, usecols=usecols)
+        df = pd.concat(frames.values(), ignore_index=True).fillna("")
+        if progress:
+            progress(len(df), total, total)
+        return df, {"format": "xls", "sheet_names": sheet_names}
     raise ValueError("Unsupported file type: %s" % ext)
+
+
+def compact_frame(df, max_unique_ratio=CATEGORY_MAX_UNIQUE_RATIO):
+    """Turn the low-cardinality text columns of `df` into categoricals, in place.
+
+    Values and column order are unchanged. Returns the memory report of the
+    table: `bytes` now, `text_bytes` with every column as text, and the
+    `categorical_columns`.
+    """
+    text_bytes = int(df.memory_usage(index=True, deep=True).sum())
+    categorical = []
+    for column in df.columns:
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            categorical.append(column)
+            continue
+        sample = series.iloc[:CATEGORY_SAMPLE_ROWS]
+        if sample.nunique(dropna=False) > max_unique_ratio * len(sample):
+            continue
+        if series.nunique(dropna=False) <= max_unique_ratio * len(series):
+            df[column] = series.astype("category")
+            categorical.append(column)
+    return {
+        "bytes": int(df.memory_usage(index=True, deep=True).sum()),
+        "text_bytes": text_bytes,
+        "categorical_columns": categorical,
+    }
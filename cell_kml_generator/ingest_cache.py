@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (Feather support of pandas)
+except Exception:
+    pyarrow = None
+
+# Feather (Arrow IPC) when pyarrow is installed; pandas pickles otherwise
+CACHE_FORMAT = "feather" if pyarrow is not None else "pickle"
+_SUFFIX = {"feather": ".feather", "pickle": ".pkl"}[CACHE_FORMAT]
+# Part of every key, so entries written by an older layout are never read back
+# (2: low-cardinality columns stored as categoricals, meta["memory"])
+_LAYOUT_VERSION = 2
+
+
+class IngestCache:
+    """Parsed inventories on disk, keyed by the content hash of the source file.
+
+    Each entry is the DataFrame (Feather or pickle, see CACHE_FORMAT) plus a
+    JSON file with the `meta` of load_file. Reading an entry refreshes its
+    modification time; `put` evicts the least recently used entries until the
+    directory holds at most `max_bytes`.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(content_digest, **options):
+        """Entry key of a file with the given content hash, parsed with `options` (e.g. the columns kept)."""
+        encoded = json.dumps([_LAYOUT_VERSION, CACHE_FORMAT, content_digest, options], sort_keys=True, default=str)
+        return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + _SUFFIX, base + ".json"
+
+    def get(self, key):
+        """(df, meta) stored under `key`, or None."""
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as handle:
+                meta = json.load(handle)
+            df = pd.read_feather(data_path) if CACHE_FORMAT == "feather" else pd.read_pickle(data_path)
+            os.utime(data_path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+            # Truncated or corrupt entry: drop it, so the file is parsed again and stored afresh
+            self._remove(key)
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return df, meta
+
+    def put(self, key, df, meta):
+        """Store an entry; a frame that cannot be written (e.g. mixed column types) is just not cached."""
+        os.makedirs(self.directory, exist_ok=True)
+        data_path, meta_path = self._paths(key)
+        # Private temporary files: two uploads of the same file may store the same key at once
+        tmp_paths = []
+        for _ in range(2):
+            handle, path = tempfile.mkstemp(dir=self.directory, prefix=key, suffix=".tmp")
+            os.close(handle)
+            tmp_paths.append(path)
+        tmp_data, tmp_meta = tmp_paths
+        try:
+            if CACHE_FORMAT == "feather":
+                df.reset_index(drop=True).to_feather(tmp_data)
+            else:
+                df.to_pickle(tmp_data)
+            with open(tmp_meta, "w", encoding="utf-8") as handle:
+                json.dump(meta, handle)
+            os.replace(tmp_meta, meta_path)
+            os.replace(tmp_data, data_path)
+        except Exception:
+            for path in (tmp_data, tmp_meta, meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            return
+        self._evict()
+
+    def _entries(self):
+        """(mtime, size, key) of every stored entry, oldest first."""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for name in os.listdir(self.directory):
+            if not name.endswith(_SUFFIX):
+                continue
+            key = name[: -len(_SUFFIX)]
+            data_path, meta_path = self._paths(key)
+            try:
+                stat = os.stat(data_path)
+                size = stat.st_size + os.path.getsize(meta_path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, size, key))
+        return sorted(entries)
+
+    def _remove(self, key):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _evict(self):
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            for _, size, key in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove(key)
+                total -= size
+                self.evictions += 1
+
+    def clear(self):
+        """Remove every entry; returns how many there were."""
+        with self._lock:
+            entries = self._entries()
+            for _, _, key in entries:
+                self._remove(key)
+            return len(entries)
+
+    def stats(self):
+        with self._lock:
+            entries = self._entries()
+            return {
+                "format": CACHE_FORMAT,
+                "directory": self.directory,
+                "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -1,10 +1,18 @@
 import datetime
-import xml.etree.ElementTree as ET
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
 
-from .earfcn_utils import calculate_petal_radius, calculate_beamwidth, get_band_info
-from .geometry import generate_petal
+import numpy as np
+
+from .cell_frame import build_cell_frame
 from .label_configurator import build_label
-from .config import BAND_COLORS, DEFAULT_BEAMWIDTH
+from .config import BAND_COLORS, KML_WORKERS, KMZ_COMPRESSION_LEVEL
+
+# Rows rendered per chunk; bounds the petal/record arrays held in memory
+KML_BATCH_SIZE = 2000
 
 
 def _kml_color(hex_rgb, alpha="ff"):
@@ -15,110 +23,76 @@ def _kml_color(hex_rgb, alpha="ff"):
     return "%s%s%s%s" % (alpha, bb, gg, rr)
 
 
-def _add_style(parent, style_id, poly_color, line_color=None, label_color=None, label_scale=None, hide_icon=False):
-    style = ET.SubElement(parent, "Style", id=style_id)
+def _text(value):
+    # Same escaping as ElementTree, but CDATA sections pass through untouched
+    return escape(value).replace("&lt;![CDATA[", "<![CDATA[").replace("]]&gt;", "]]>")
+
+
+def _element(tag, text):
+    if not text:
+        return "<%s />" % tag
+    return "<%s>%s</%s>" % (tag, _text(text), tag)
+
+
+def _style(style_id, poly_color, line_color=None, label_color=None, label_scale=None, hide_icon=False):
+    parts = ['<Style id="%s">' % escape(style_id, {'"': "&quot;"})]
     if poly_color:
-        polystyle = ET.SubElement(style, "PolyStyle")
-        ET.SubElement(polystyle, "color").text = poly_color
+        parts.append("<PolyStyle>%s</PolyStyle>" % _element("color", poly_color))
     if line_color:
-        linestyle = ET.SubElement(style, "LineStyle")
-        ET.SubElement(linestyle, "color").text = line_color
+        parts.append("<LineStyle>%s</LineStyle>" % _element("color", line_color))
     if label_color or label_scale:
-        labelstyle = ET.SubElement(style, "LabelStyle")
+        parts.append("<LabelStyle>")
         if label_color:
-            ET.SubElement(labelstyle, "color").text = label_color
+            parts.append(_element("color", label_color))
         if label_scale:
-            ET.SubElement(labelstyle, "scale").text = str(label_scale)
+            parts.append(_element("scale", str(label_scale)))
+        parts.append("</LabelStyle>")
     if hide_icon:
-        iconstyle = ET.SubElement(style, "IconStyle")
-        ET.SubElement(iconstyle, "scale").text = "0"
-    return style
+        parts.append("<IconStyle>%s</IconStyle>" % _element("scale", "0"))
+    parts.append("</Style>")
+    return "".join(parts)
 
 
-def generate_kml(df, mapping, label_config, extra_fields, scale, band_scale_overrides, beamwidth_overrides=None):
-    doc_name = "Cell Sites - %s" % datetime.date.today().isoformat()
-    kml = ET.Element("kml", xmlns="http://www.opengis.net/kml/2.2")
-    document = ET.SubElement(kml, "Document")
-    ET.SubElement(document, "name").text = doc_name
+def _band_groups(cells):
+    """Valid row positions grouped by band, in order of first appearance."""
+    positions = cells.positions
+    band_index = cells.band_index[positions]
+    bands, first = np.unique(band_index, return_index=True)
+    for band in bands[np.argsort(first, kind="stable")]:
+        yield int(band), positions[band_index == band]
 
-    label_color = _kml_color(label_config.text_color, alpha="ff")
-    _add_style(
-        document,
-        "label_site",
-        None,
-        label_color=label_color,
-        label_scale=label_config.text_scale if label_config.show_label else 0.0,
-        hide_icon=True,
-    )
-
-    for key, color in BAND_COLORS.items():
-        _add_style(document, "band_%s" % key, color, line_color=color, hide_icon=True)
-
-    folders = {}
-    for _, row in df.iterrows():
-        lat = row.get(mapping["latitude"], "")
-        lon = row.get(mapping["longitude"], "")
-        if lat == "" or lon == "":
-            continue
-        try:
-            lat_f = float(lat)
-            lon_f = float(lon)
-        except ValueError:
-            continue
 
-        earfcn = row.get(mapping.get("earfcn", ""), "")
-        band_info = get_band_info(earfcn)
-        if band_info:
-            folder_name = band_info["label"]
-            band_key = band_info["key"]
-        else:
-            folder_name = "Unknown Band"
-            band_key = "2600"
+def _render_batch(cells, batch, band_info, options):
+    """Render the site and cell Placemarks of the rows at `batch` as UTF-8 bytes."""
+    mapping, label_config, extra_fields, scale, band_scale_overrides, beamwidth_overrides = options
 
-        if folder_name not in folders:
-            folders[folder_name] = ET.SubElement(document, "Folder")
-            ET.SubElement(folders[folder_name], "name").text = folder_name
+    site_field = label_config.site_field or mapping.get("site_name", "")
+    if label_config.hide_cell_label:
+        cell_field = None
+    elif label_config.use_site_for_cell:
+        cell_field = site_field
+    else:
+        cell_field = label_config.cell_field or mapping.get("cell_name", "")
+    style_url = _element("styleUrl", "#band_%s" % (band_info["key"] if band_info else "2600"))
 
-        folder = folders[folder_name]
+    vertices, counts = cells.petals(scale, band_scale_overrides, beamwidth_overrides, positions=batch)
+    parts = []
+    for idx, row in enumerate(cells.records(batch)):
+        pos = batch[idx]
+        lat_f = float(cells.lat[pos])
+        lon_f = float(cells.lon[pos])
+        az = row.get(mapping.get("azimuth", ""), "0")
+        earfcn = row.get(mapping.get("earfcn", ""), "")
 
-        site_field = label_config.site_field or mapping.get("site_name", "")
         site_label = build_label(row, site_field, label_config.template)
         if site_label:
-            pm_site = ET.SubElement(folder, "Placemark")
-            ET.SubElement(pm_site, "name").text = site_label
-            ET.SubElement(pm_site, "styleUrl").text = "#label_site"
-            point = ET.SubElement(pm_site, "Point")
-            ET.SubElement(point, "coordinates").text = "%s,%s,0" % (lon_f, lat_f)
-
-        if label_config.hide_cell_label:
-            cell_label = ""
-        else:
-            field = label_config.cell_field or mapping.get("cell_name", "")
-            if label_config.use_site_for_cell:
-                field = site_field
-            cell_label = build_label(row, field, "")
+            parts.append("<Placemark>")
+            parts.append(_element("name", site_label))
+            parts.append(_element("styleUrl", "#label_site"))
+            parts.append("<Point>%s</Point>" % _element("coordinates", "%s,%s,0" % (lon_f, lat_f)))
+            parts.append("</Placemark>")
 
-        az = row.get(mapping.get("azimuth", ""), "0")
-        try:
-            az_f = float(az)
-        except ValueError:
-            az_f = 0.0
-
-        # Get beamwidth from mapped column or calculate based on band
-        beam = row.get(mapping.get("beamwidth", ""), "")
-        try:
-            beam_f = float(beam)
-        except ValueError:
-            # Use band-specific beamwidth if no column mapped
-            beam_f = calculate_beamwidth(earfcn, beamwidth_overrides)
-
-        radius = calculate_petal_radius(earfcn, scale, band_scale_overrides)
-        coords = generate_petal(lat_f, lon_f, az_f, beam_f, radius)
-
-        pm_cell = ET.SubElement(folder, "Placemark")
-        ET.SubElement(pm_cell, "name").text = cell_label
-        ET.SubElement(pm_cell, "styleUrl").text = "#band_%s" % band_key
-        desc = ET.SubElement(pm_cell, "description")
+        cell_label = "" if cell_field is None else build_label(row, cell_field, "")
 
         # Format description as "Field = Value" - one per line
         site_val = row.get(mapping.get("site_name", ""), "")
@@ -137,14 +111,208 @@ def generate_kml(df, mapping, label_config, extra_fields, scale, band_scale_over
         ]
         for field in extra_fields:
             lines.append("%s = %s" % (field, row.get(field, "")))
-        desc.text = "\n".join(lines)
 
-        polygon = ET.SubElement(pm_cell, "Polygon")
-        outer = ET.SubElement(polygon, "outerBoundaryIs")
-        ring = ET.SubElement(outer, "LinearRing")
+        coords = vertices[idx, : counts[idx]].tolist()
         coord_text = "\n".join(["%s,%s,0" % (c[0], c[1]) for c in coords])
-        ET.SubElement(ring, "coordinates").text = coord_text
 
-    raw = ET.tostring(kml, encoding="utf-8", xml_declaration=True).decode("utf-8")
-    raw = raw.replace("&lt;![CDATA[", "<![CDATA[").replace("]]&gt;", "]]>")
-    return raw.encode("utf-8")
+        parts.append("<Placemark>")
+        parts.append(_element("name", cell_label))
+        parts.append(style_url)
+        parts.append(_element("description", "\n".join(lines)))
+        parts.append("<Polygon><outerBoundaryIs><LinearRing>")
+        parts.append(_element("coordinates", coord_text))
+        parts.append("</LinearRing></outerBoundaryIs></Polygon>")
+        parts.append("</Placemark>")
+    return "".join(parts).encode("utf-8")
+
+
+def _render_shard(shard, band_info, options):
+    # Process pool entry point: `shard` holds only the rows to render
+    return _render_batch(shard, np.arange(len(shard)), band_info, options)
+
+
+def _folder_fragments(cells):
+    """Folder markup (bytes) and row batches (band_info, positions), in document order."""
+    for band, band_positions in _band_groups(cells):
+        band_info = cells.band_info(band_positions[0])
+        folder_name = band_info["label"] if band_info else "Unknown Band"
+        yield ("<Folder>%s" % _element("name", folder_name)).encode("utf-8")
+        for start in range(0, len(band_positions), KML_BATCH_SIZE):
+            yield band_info, band_positions[start : start + KML_BATCH_SIZE]
+        yield b"</Folder>"
+
+
+def _iter_parallel(cells, options, workers, progress=None):
+    """Render the row batches on a process pool, yielding the results in document order.
+
+    At most `2 * workers` batches are in flight, so the parent never holds more
+    than a few shards and rendered fragments at once.
+    """
+    pool = ProcessPoolExecutor(max_workers=workers)
+    pending = deque()
+    batch_rows = {}
+    in_flight = 0
+
+    def result(future):
+        rows = batch_rows.pop(future)
+        chunk = future.result()
+        if progress is not None:
+            progress(rows)
+        return chunk
+
+    try:
+        for fragment in _folder_fragments(cells):
+            if isinstance(fragment, bytes):
+                pending.append(fragment)
+            else:
+                band_info, batch = fragment
+                future = pool.submit(_render_shard, cells.take(batch), band_info, options)
+                batch_rows[future] = len(batch)
+                pending.append(future)
+                in_flight += 1
+            # Emit whatever is ready at the head; block only when the window is full
+            while pending and (isinstance(pending[0], bytes) or pending[0].done() or in_flight > 2 * workers):
+                item = pending.popleft()
+                if isinstance(item, bytes):
+                    yield item
+                else:
+                    in_flight -= 1
+                    yield result(item)
+        for item in pending:
+            yield item if isinstance(item, bytes) else result(item)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_kml(
+    df,
+    mapping,
+    label_config,
+    extra_fields,
+    scale,
+    band_scale_overrides,
+    beamwidth_overrides=None,
+    cells=None,
+    workers=None,
+    progress=None,
+):
+    """Yield the KML document as UTF-8 chunks, one band folder at a time.
+
+    Petals and row records are built per batch of KML_BATCH_SIZE rows, so memory
+    stays flat regardless of the inventory size and the first bytes can be sent
+    before the last folder is rendered. With `workers` > 1 (default KML_WORKERS,
+    0 = one per CPU) the batches are rendered on a process pool; the output is
+    byte-identical to the serial path. `progress(rows)`, when given, is called
+    with the number of rows of every batch once it is rendered. `df` may be
+    None when `cells` is given: the rows are then read through `cells`.
+    """
+    doc_name = "Cell Sites - %s" % datetime.date.today().isoformat()
+    head = [
+        "<?xml version='1.0' encoding='utf-8'?>\n",
+        '<kml xmlns="http://www.opengis.net/kml/2.2"><Document>',
+        _element("name", doc_name),
+    ]
+
+    label_color = _kml_color(label_config.text_color, alpha="ff")
+    head.append(
+        _style(
+            "label_site",
+            None,
+            label_color=label_color,
+            label_scale=label_config.text_scale if label_config.show_label else 0.0,
+            hide_icon=True,
+        )
+    )
+
+    for key, color in BAND_COLORS.items():
+        head.append(_style("band_%s" % key, color, line_color=color, hide_icon=True))
+    yield "".join(head).encode("utf-8")
+
+    if cells is None or (df is not None and cells.df is not df) or cells.mapping != mapping:
+        cells = build_cell_frame(df, mapping)
+
+    options = (mapping, label_config, extra_fields, scale, band_scale_overrides, beamwidth_overrides)
+    if workers is None:
+        workers = KML_WORKERS
+    if workers == 0:
+        workers = os.cpu_count() or 1
+
+    # A single batch is not worth the pool start-up
+    if workers > 1 and len(cells.positions) > KML_BATCH_SIZE:
+        yield from _iter_parallel(cells, options, workers, progress)
+    else:
+        for fragment in _folder_fragments(cells):
+            if isinstance(fragment, bytes):
+                yield fragment
+            else:
+                band_info, batch = fragment
+                chunk = _render_batch(cells, batch, band_info, options)
+                if progress is not None:
+                    progress(len(batch))
+                yield chunk
+
+    yield b"</Document></kml>"
+
+
+def generate_kml(
+    df,
+    mapping,
+    label_config,
+    extra_fields,
+    scale,
+    band_scale_overrides,
+    beamwidth_overrides=None,
+    cells=None,
+    workers=None,
+):
+    return b"".join(
+        iter_kml(
+            df,
+            mapping,
+            label_config,
+            extra_fields,
+            scale,
+            band_scale_overrides,
+            beamwidth_overrides,
+            cells=cells,
+            workers=workers,
+        )
+    )
+
+
+class _ZipStream:
+    """Write-only, unseekable sink for ZipFile; `drain()` hands back what was written."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_kmz(kml_chunks, compresslevel=KMZ_COMPRESSION_LEVEL):
+    """Compress KML chunks into a KMZ (zip with a single doc.kml) as they arrive.
+
+    The archive is written in streaming mode (sizes go in data descriptors), so
+    neither the KML nor the KMZ is ever held in memory as a whole. The KML size
+    is not known up front, so the entry is always written with Zip64 sizes:
+    without them a doc.kml above 2 GiB would fail halfway through the stream.
+    """
+    sink = _ZipStream()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as archive:
+        with archive.open("doc.kml", "w", force_zip64=True) as entry:
+            for chunk in kml_chunks:
+                entry.write(chunk)
+                data = sink.drain()
+                if data:
+                    yield data
+    yield sink.drain()
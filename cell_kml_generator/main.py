@@ -6,7 +6,7 @@ from tkinter import ttk, filedialog, messagebox, colorchooser
 
 import pandas as pd
 
-from .config import APP_NAME, PREVIEW_ROWS, DEFAULT_LABEL_COLOR, BAND_RADIUS_M, BAND_BEAMWIDTH
+from .config import APP_NAME, PREVIEW_ROWS, DEFAULT_LABEL_COLOR, BAND_RADIUS_M, BAND_BEAMWIDTH, BAND_RANGES, KMZ_COMPRESSION_LEVEL
 
 
 def get_resource_path(filename):
@@ -29,8 +29,8 @@ from .validators import (
     find_missing_earfcn,
     find_empty_labels,
 )
-from .earfcn_utils import get_band_info
-from .kml_generator import generate_kml
+from .cell_frame import build_cell_frame
+from .kml_generator import iter_kml, iter_kmz
 
 
 class App(tk.Tk):
@@ -59,6 +59,7 @@ class App(tk.Tk):
         self.configure(bg=self.bg_color)
 
         self.df = None
+        self.cells = None
         self.file_path = ""
         self.mapping = {}
         self.extra_fields = []
@@ -825,6 +826,21 @@ class App(tk.Tk):
             command=self.on_choose_report, padx=10, pady=3)
         report_btn.pack(side=tk.LEFT)
 
+        # KMZ compression (used when the output file ends with .kmz)
+        kmz_row = tk.Frame(paths_card, bg=self.card_bg)
+        kmz_row.pack(fill=tk.X, padx=10, pady=(0, 10))
+
+        tk.Label(kmz_row, text="KMZ compression (0-9):",
+            font=("Segoe UI", 10), bg=self.card_bg, fg=self.subtext_color, width=22, anchor=tk.W).pack(side=tk.LEFT)
+
+        self.kmz_level_var = tk.StringVar(value=str(KMZ_COMPRESSION_LEVEL))
+        kmz_combo = ttk.Combobox(kmz_row, textvariable=self.kmz_level_var, width=5, state="readonly")
+        kmz_combo["values"] = [str(level) for level in range(10)]
+        kmz_combo.pack(side=tk.LEFT)
+
+        tk.Label(kmz_row, text="Higher = smaller file, slower",
+            font=("Segoe UI", 9), bg=self.card_bg, fg=self.subtext_color).pack(side=tk.LEFT, padx=(10, 0))
+
         # Action buttons
         buttons_frame = tk.Frame(frame, bg=self.bg_color)
         buttons_frame.pack(fill=tk.X, pady=(5, 15))
@@ -894,6 +910,7 @@ class App(tk.Tk):
             messagebox.showerror("Error", str(exc))
             return
         self.df = df
+        self.cells = None
         self.file_path = path
         filename = os.path.basename(path)
         self.file_label.configure(text=filename, fg=self.success_color)
@@ -1049,7 +1066,7 @@ class App(tk.Tk):
     def on_choose_kml(self):
         path = filedialog.asksaveasfilename(
             defaultextension=".kml",
-            filetypes=[("KML", "*.kml")],
+            filetypes=[("KML", "*.kml"), ("KMZ", "*.kmz")],
             initialdir=self.last_dir,
         )
         if path:
@@ -1138,10 +1155,16 @@ class App(tk.Tk):
                 self.log(warn)
 
         self.progress["value"] = 40
-        kml_bytes = generate_kml(self.df, self.mapping, label_config, extra_fields, scale, band_overrides, beamwidth_overrides)
+        cells = self._get_cells()
+        kml_chunks = iter_kml(
+            self.df, self.mapping, label_config, extra_fields, scale, band_overrides, beamwidth_overrides, cells=cells
+        )
+        if kml_path.lower().endswith(".kmz"):
+            kml_chunks = iter_kmz(kml_chunks, int(self.kmz_level_var.get() or KMZ_COMPRESSION_LEVEL))
         try:
             with open(kml_path, "wb") as handle:
-                handle.write(kml_bytes)
+                for chunk in kml_chunks:
+                    handle.write(chunk)
         except PermissionError:
             messagebox.showerror(
                 "Error",
@@ -1160,6 +1183,12 @@ class App(tk.Tk):
         self.log("KML generated: %s" % kml_path)
         messagebox.showinfo("Completed", "KML generated successfully.")
 
+    def _get_cells(self):
+        """Typed columns for the current file/mapping, rebuilt only when either changes."""
+        if self.cells is None or self.cells.df is not self.df or self.cells.mapping != self.mapping:
+            self.cells = build_cell_frame(self.df, self.mapping)
+        return self.cells
+
     def _write_report(self, path, label_config):
         total_cells = len(self.df)
         site_col = self.mapping.get("site_name")
@@ -1168,9 +1197,8 @@ class App(tk.Tk):
         band_counts = {}
         earfcn_col = self.mapping.get("earfcn")
         if earfcn_col:
-            for value in self.df[earfcn_col].values:
-                info = get_band_info(value)
-                key = info["label"] if info else "Unknown Band"
+            for idx in self._get_cells().band_index.tolist():
+                key = BAND_RANGES[idx]["label"] if idx >= 0 else "Unknown Band"
                 band_counts[key] = band_counts.get(key, 0) + 1
 
         lines = [
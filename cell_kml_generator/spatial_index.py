@@ -0,0 +1,149 @@
+import math
+
+import numpy as np
+
+# Average number of points per grid bucket the index is sized for
+GRID_POINTS_PER_BUCKET = 16
+GRID_MAX_BUCKETS_PER_AXIS = 2048
+
+
+class GridIndex:
+    """Uniform lat/lon grid over point coordinates for bounding-box queries.
+
+    Points are sorted by bucket id (column-major: x * ny + y), so the points of
+    one grid column between two rows are a contiguous slice found with
+    `searchsorted`. Queries return the original positions in ascending order.
+    """
+
+    def __init__(self, lat, lon, positions=None):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        if positions is None:
+            positions = np.arange(len(lat))
+        positions = np.asarray(positions)
+        self.size = len(positions)
+        if self.size == 0:
+            self.bounds = None
+            return
+
+        plat = lat[positions]
+        plon = lon[positions]
+        self.bounds = (float(plat.min()), float(plon.min()), float(plat.max()), float(plon.max()))
+        south, west, north, east = self.bounds
+
+        side = int(math.ceil(math.sqrt(self.size / GRID_POINTS_PER_BUCKET)))
+        self.nx = self.ny = min(max(side, 1), GRID_MAX_BUCKETS_PER_AXIS)
+        self.dx = max(east - west, 1e-9) / self.nx
+        self.dy = max(north - south, 1e-9) / self.ny
+
+        keys = self._bucket_x(plon) * self.ny + self._bucket_y(plat)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.positions = positions[order]
+        self.lat = plat[order]
+        self.lon = plon[order]
+
+    def _bucket_x(self, lon):
+        return np.clip(np.floor((np.asarray(lon) - self.bounds[1]) / self.dx), 0, self.nx - 1).astype(np.int64)
+
+    def _bucket_y(self, lat):
+        return np.clip(np.floor((np.asarray(lat) - self.bounds[0]) / self.dy), 0, self.ny - 1).astype(np.int64)
+
+    def query(self, south, west, north, east):
+        """Positions of the points inside the box (edges included), ascending."""
+        if self.bounds is None:
+            return np.empty(0, dtype=np.int64)
+        b_south, b_west, b_north, b_east = self.bounds
+        if south > b_north or north < b_south or west > b_east or east < b_west:
+            return np.empty(0, dtype=np.int64)
+
+        x0, x1 = self._bucket_x([west, east])
+        y0, y1 = self._bucket_y([south, north])
+        columns = np.arange(x0, x1 + 1) * self.ny
+        starts = np.searchsorted(self.keys, columns + y0, side="left")
+        ends = np.searchsorted(self.keys, columns + y1, side="right")
+        picked = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+
+        lat = self.lat[picked]
+        lon = self.lon[picked]
+        inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+        return np.sort(self.positions[picked[inside]])
+
+
+# Size of a cluster bucket on screen and the deepest zoom level precomputed
+CLUSTER_CELL_PX = 80
+CLUSTER_MAX_LEVEL = 14
+_MAX_MERCATOR_LAT = 85.05112878
+
+
+def _mercator_xy(lat, lon):
+    """Web Mercator coordinates normalised to 0..1 (zoom 0, one 1x1 world tile)."""
+    lat = np.radians(np.clip(lat, -_MAX_MERCATOR_LAT, _MAX_MERCATOR_LAT))
+    x = (np.asarray(lon) + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0
+    return x, y
+
+
+class ClusterPyramid:
+    """Screen-space grid clusters of points for every zoom level 0..CLUSTER_MAX_LEVEL.
+
+    A bucket is CLUSTER_CELL_PX pixels wide at its zoom level, so the bucket of
+    a point at level z-1 is its level-z bucket halved: the finest level is built
+    from the points and every coarser level is aggregated from the one below.
+    Each level holds the point count, the centroid and a count per category
+    (band index, with the last column for "unknown").
+    """
+
+    def __init__(self, lat, lon, category, n_categories, positions=None):
+        if positions is None:
+            positions = np.arange(len(lat))
+        lat = np.asarray(lat, dtype=np.float64)[positions]
+        lon = np.asarray(lon, dtype=np.float64)[positions]
+        category = np.asarray(category)[positions]
+        self.n_categories = n_categories
+        self.levels = [None] * (CLUSTER_MAX_LEVEL + 1)
+
+        x, y = _mercator_xy(lat, lon)
+        world_px = 256.0 * 2**CLUSTER_MAX_LEVEL
+        bx = np.floor(x * world_px / CLUSTER_CELL_PX).astype(np.int64)
+        by = np.floor(y * world_px / CLUSTER_CELL_PX).astype(np.int64)
+        level = self._aggregate(bx, by, np.ones(len(lat)), lat, lon, category[:, None] == np.arange(n_categories))
+        self.levels[CLUSTER_MAX_LEVEL] = level
+        for z in range(CLUSTER_MAX_LEVEL - 1, -1, -1):
+            level = self._aggregate(
+                level["bx"] // 2,
+                level["by"] // 2,
+                level["count"],
+                level["lat_sum"],
+                level["lon_sum"],
+                level["categories"],
+            )
+            self.levels[z] = level
+
+    @staticmethod
+    def _aggregate(bx, by, count, lat_sum, lon_sum, categories):
+        keys = bx * (1 << 32) + by
+        unique, inverse = np.unique(keys, return_inverse=True)
+        n = len(unique)
+        sums = np.zeros((n, categories.shape[1]), dtype=np.int64)
+        for col in range(categories.shape[1]):
+            sums[:, col] = np.bincount(inverse, weights=categories[:, col], minlength=n)
+        return {
+            "bx": unique >> 32,
+            "by": unique & 0xFFFFFFFF,
+            "count": np.bincount(inverse, weights=count, minlength=n),
+            "lat_sum": np.bincount(inverse, weights=lat_sum, minlength=n),
+            "lon_sum": np.bincount(inverse, weights=lon_sum, minlength=n),
+            "categories": sums,
+        }
+
+    def query(self, zoom, south, west, north, east):
+        """Clusters of level `zoom` whose centroid lies in the box.
+
+        Returns (lat, lon, count, categories) arrays.
+        """
+        level = self.levels[min(max(int(zoom), 0), CLUSTER_MAX_LEVEL)]
+        lat = level["lat_sum"] / level["count"]
+        lon = level["lon_sum"] / level["count"]
+        inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+        return lat[inside], lon[inside], level["count"][inside].astype(np.int64), level["categories"][inside]
@@ -0,0 +1,371 @@
+"""Streaming .xlsx reader.
+
+The sheet XML is parsed with expat straight into rows of text, without the
+cell objects of an openpyxl workbook: only the shared strings, the sheet list
+and the date styles are read up front. Values come out as the text
+pd.read_excel(dtype=str) gives them (integral numbers without ".0", dates as
+"YYYY-MM-DD HH:MM:SS", errors and blanks as "").
+"""
+
+import posixpath
+import zipfile
+from xml.etree import ElementTree
+from xml.parsers import expat
+
+import pandas as pd
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel, from_ISO8601
+
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_DOC_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+# Sheet XML tags as the namespace-aware expat parser reports them
+_C, _V, _T, _RPH, _ROW, _SI = (_MAIN_NS.strip("{}") + " " + tag for tag in ("c", "v", "t", "rPh", "row", "si"))
+# Rows between two progress reports
+PROGRESS_ROWS = 10_000
+# Column letters -> 0-based index, filled as references are met
+_COLUMN_INDEX = {}
+
+
+def _part_path(base, target):
+    """Zip member a relationship target points to (targets are relative to the part's folder)."""
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base), target))
+
+
+def _relationships(archive, part):
+    rels_path = posixpath.join(posixpath.dirname(part), "_rels", posixpath.basename(part) + ".rels")
+    if rels_path not in archive.namelist():
+        return {}
+    root = ElementTree.fromstring(archive.read(rels_path))
+    return {
+        rel.get("Id"): (rel.get("Type", "").rsplit("/", 1)[-1], _part_path(part, rel.get("Target", "")))
+        for rel in root.iter(_PKG_REL_NS + "Relationship")
+    }
+
+
+def _parser(start, end, data):
+    """Expat parser reporting tags as "<namespace> <name>", whatever prefix the file uses."""
+    parser = expat.ParserCreate(namespace_separator=" ")
+    parser.buffer_text = True
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = data
+    return parser
+
+
+def _parse_text_items(source, item_tag):
+    """Text of every `item_tag` element (shared string <si>), joining its <t> runs, phonetic runs left out."""
+    items = []
+    parts = []
+    in_text = False
+    phonetic = 0
+
+    def start(name, attrs):
+        nonlocal in_text, phonetic
+        if name == _T and not phonetic:
+            in_text = True
+        elif name == _RPH:
+            phonetic += 1
+
+    def end(name):
+        nonlocal in_text, phonetic
+        if name == _T:
+            in_text = False
+        elif name == _RPH:
+            phonetic -= 1
+        elif name == item_tag:
+            items.append("".join(parts))
+            parts.clear()
+
+    def data(text):
+        if in_text:
+            parts.append(text)
+
+    _parser(start, end, data).ParseFile(source)
+    return items
+
+
+def _date_styles(archive, path):
+    """Style indexes with a date (and with a duration) number format."""
+    dates, durations = set(), set()
+    if path is None:
+        return dates, durations
+    root = ElementTree.fromstring(archive.read(path))
+    codes = dict(BUILTIN_FORMATS)
+    for fmt in root.iter(_MAIN_NS + "numFmt"):
+        codes[int(fmt.get("numFmtId"))] = fmt.get("formatCode", "")
+    cell_xfs = root.find(_MAIN_NS + "cellXfs")
+    for index, xf in enumerate([] if cell_xfs is None else cell_xfs.iter(_MAIN_NS + "xf")):
+        code = codes.get(int(xf.get("numFmtId", 0)), "")
+        if is_date_format(code):
+            dates.add(str(index))
+            if is_timedelta_format(code):
+                durations.add(str(index))
+    return dates, durations
+
+
+def _column_index(ref):
+    """0-based column of a cell reference ("C12" -> 2)."""
+    letters = ref.rstrip("0123456789")
+    index = _COLUMN_INDEX.get(letters)
+    if index is None:
+        index = 0
+        for char in letters:
+            index = index * 26 + ord(char) - 64
+        index = _COLUMN_INDEX[letters] = index - 1
+    return index
+
+
+def _number_text(value):
+    """Numeric cell text as openpyxl + pd.read_excel(dtype=str) render it."""
+    if "." in value or "E" in value or "e" in value:
+        number = float(value)
+        return str(int(number)) if number.is_integer() else str(number)
+    return str(int(value))
+
+
+class XlsxWorkbook:
+    """The sheets of an .xlsx file, read row by row (see `rows`)."""
+
+    def __init__(self, path):
+        self.archive = zipfile.ZipFile(path)
+        root_rels = _relationships(self.archive, "")
+        workbook_part = next(
+            (target for kind, target in root_rels.values() if kind == "officeDocument"), "xl/workbook.xml"
+        )
+        rels = _relationships(self.archive, workbook_part)
+        root = ElementTree.fromstring(self.archive.read(workbook_part))
+        properties = root.find(_MAIN_NS + "workbookPr")
+        date1904 = properties is not None and properties.get("date1904", "0").lower() in ("1", "true")
+        self.epoch = CALENDAR_MAC_1904 if date1904 else CALENDAR_WINDOWS_1900
+        self.sheets = {}
+        for sheet in root.iter(_MAIN_NS + "sheet"):
+            kind, target = rels.get(sheet.get(_DOC_REL_NS + "id"), ("", ""))
+            if kind == "worksheet":
+                self.sheets[sheet.get("name")] = target
+        parts = {kind: target for kind, target in rels.values()}
+        self.shared_strings = []
+        if "sharedStrings" in parts:
+            with self.archive.open(parts["sharedStrings"]) as source:
+                self.shared_strings = _parse_text_items(source, _SI)
+        self.date_styles, self.duration_styles = _date_styles(self.archive, parts.get("styles"))
+
+    @property
+    def sheet_names(self):
+        return list(self.sheets)
+
+    def close(self):
+        self.archive.close()
+
+    def sheet_size(self, name):
+        """Uncompressed size of the sheet XML, the unit of `bytes_read`."""
+        return self.archive.getinfo(self.sheets[name]).file_size
+
+    def _cell_text(self, kind, style, value):
+        if value == "":
+            return ""
+        if kind == "s":
+            return self.shared_strings[int(value)]
+        if kind in ("str", "inlineStr"):
+            return value
+        if kind == "e":
+            return ""
+        if kind == "b":
+            return "True" if value in ("1", "true") else "False"
+        if kind == "d":
+            return str(from_ISO8601(value))
+        if style in self.date_styles:
+            return str(from_excel(float(value), self.epoch, timedelta=style in self.duration_styles))
+        return _number_text(value)
+
+    def rows(self, name):
+        """Lists of cell texts of the rows of sheet `name` from row 1, as a grid anchored at A1.
+
+        Missing cells are "", blank rows are [] and rows after the last one
+        holding a value are left out. `bytes_read` counts the sheet XML
+        parsed so far.
+        """
+        self.bytes_read = 0
+        batch = []
+        row = []
+        parts = []
+        kind = style = None
+        column = 0
+        in_text = False
+        phonetic = 0
+        number = 0
+        blanks = 0
+        cell_text = self._cell_text
+
+        def start(tag, attrs):
+            nonlocal kind, style, column, in_text, phonetic, number, blanks
+            if tag == _C:
+                kind = attrs.get("t", "n")
+                style = attrs.get("s", "0")
+                ref = attrs.get("r")
+                column = _column_index(ref) if ref else len(row)
+                parts.clear()
+            elif tag == _V or (tag == _T and not phonetic):
+                in_text = True
+            elif tag == _RPH:
+                phonetic += 1
+            elif tag == _ROW:
+                row.clear()
+                previous = number
+                number = int(attrs.get("r") or previous + 1)
+                blanks += number - previous - 1
+
+        def end(tag):
+            nonlocal in_text, phonetic, blanks
+            if tag == _V or tag == _T:
+                in_text = False
+            elif tag == _C:
+                text = cell_text(kind, style, "".join(parts))
+                if text:
+                    if column > len(row):
+                        row.extend([""] * (column - len(row)))
+                    row.append(text)
+            elif tag == _RPH:
+                phonetic -= 1
+            elif tag == _ROW:
+                if not row:
+                    blanks += 1
+                    return
+                if blanks:
+                    batch.extend([] for _ in range(blanks))
+                    blanks = 0
+                batch.append(list(row))
+
+        def data(text):
+            if in_text:
+                parts.append(text)
+
+        parser = _parser(start, end, data)
+        with self.archive.open(self.sheets[name]) as source:
+            while True:
+                chunk = source.read(1024 * 1024)
+                parser.Parse(chunk, not chunk)
+                self.bytes_read += len(chunk)
+                yield from batch
+                batch.clear()
+                if not chunk:
+                    return
+
+
+def select_sheets(sheet_names, sheet):
+    """Names of the sheets `sheet` asks for: None = first, "*" = all, a name, an index or a list of them."""
+    if sheet is None:
+        return sheet_names[:1]
+    if sheet == "*":
+        return list(sheet_names)
+    selected = []
+    for item in sheet if isinstance(sheet, (list, tuple)) else [sheet]:
+        if isinstance(item, int) or (isinstance(item, str) and item.isdigit() and item not in sheet_names):
+            index = int(item)
+            if not 0 <= index < len(sheet_names):
+                raise ValueError("Sheet index out of range: %s" % item)
+            selected.append(sheet_names[index])
+        elif item in sheet_names:
+            selected.append(item)
+        else:
+            raise ValueError("Sheet not found: %s" % item)
+    return selected
+
+
+def _header_names(header):
+    """Column names of a header row: blanks become "Unnamed: i", repeats get ".1", ".2"... as in pandas."""
+    names = []
+    seen = {}
+    for i, value in enumerate(header):
+        name = value or "Unnamed: %d" % i
+        if name in seen:
+            seen[name] += 1
+            name = "%s.%d" % (name, seen[name])
+        seen.setdefault(name, 0)
+        names.append(name)
+    return names
+
+
+def _read_sheet(rows, usecols, on_rows):
+    """DataFrame of one sheet, row 1 being the header.
+
+    Without `usecols` the table is as wide as its widest row; with it, only
+    columns named in the header can be picked.
+    """
+    header = next(rows, [])
+    names = _header_names(header)
+    if callable(usecols):
+        keep = [i for i, name in enumerate(names) if usecols(name)]
+    elif usecols is not None:
+        wanted = set(usecols)
+        keep = [i for i, name in enumerate(names) if name in wanted]
+    else:
+        keep = None
+
+    width = len(names)
+    data = []
+    for count, row in enumerate(rows, 1):
+        if keep is None:
+            width = max(width, len(row))
+            data.append(row)
+        else:
+            if len(row) < width:
+                row.extend([""] * (width - len(row)))
+            data.append([row[i] for i in keep])
+        if count % PROGRESS_ROWS == 0:
+            on_rows(count)
+    if keep is None:
+        for row in data:
+            if len(row) < width:
+                row.extend([""] * (width - len(row)))
+        names = _header_names(header + [""] * (width - len(header)))
+        keep = range(width)
+    return pd.DataFrame(data, columns=[names[i] for i in keep], dtype=object)
+
+
+def read_xlsx_header(path, sheet=None):
+    """Column names of the sheets `sheet` picks (see select_sheets), each name once, in sheet order."""
+    workbook = XlsxWorkbook(path)
+    try:
+        names = []
+        for name in select_sheets(workbook.sheet_names, sheet):
+            rows = workbook.rows(name)
+            names.extend(_header_names(next(rows, [])))
+            rows.close()
+    finally:
+        workbook.close()
+    return list(dict.fromkeys(names))
+
+
+def read_xlsx(path, sheet=None, usecols=None, progress=None):
+    """Read sheets of an .xlsx workbook as a text DataFrame; returns (df, sheet names of the workbook).
+
+    `sheet` picks the sheets (see select_sheets); several sheets are
+    concatenated, with "" where a sheet lacks a column. `usecols` (names or a
+    callable) limits the columns kept. `progress(rows, bytes_read,
+    bytes_total)` is called every PROGRESS_ROWS rows, bytes being those of
+    the (uncompressed) sheet XML parsed so far.
+    """
+    workbook = XlsxWorkbook(path)
+    try:
+        names = select_sheets(workbook.sheet_names, sheet)
+        total = sum(workbook.sheet_size(name) for name in names)
+        frames = []
+        rows_before = bytes_before = 0
+        for name in names:
+
+            def on_rows(count, rows_before=rows_before, bytes_before=bytes_before):
+                if progress:
+                    progress(rows_before + count, bytes_before + workbook.bytes_read, total)
+
+            frames.append(_read_sheet(workbook.rows(name), usecols, on_rows))
+            rows_before += len(frames[-1])
+            bytes_before += workbook.sheet_size(name)
+    finally:
+        workbook.close()
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True).fillna("")
+    if progress:
+        progress(len(df), total, total)
+    return df.astype(str), workbook.sheet_names
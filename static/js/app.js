@@ -2,10 +2,30 @@ let map;
 let baseLayers;
 let overlayControl;
 let labelLayer;
+let clusterLayer;
+let sectorTiles; // "Sector tiles" overlay: server-rendered tiles from /api/tiles
+const SECTOR_TILES_LABEL = "Sector tiles";
 let bandLayers = {};
 let autoRefreshEnabled = false;
 let polygonIndex = {};
 let siteIndex = {};
+let mapDataLoaded = false;
+let loadedBounds = null; // area covered by the last /api/map-data response
+let dataBoundsKey = ""; // dataset extent last fitted, to refit only when the data changes
+let loadedZoom = null;
+let loadedClustered = false; // clusters depend on the zoom level, petals do not
+let loadedEtag = null; // ETag of the map data currently drawn
+let mapRequestSeq = 0;
+let mapRequestAbort = null; // AbortController of the /api/map-data request in flight
+let liveRefreshTimer = null;
+const LIVE_REFRESH_DELAY_MS = 300; // Live mode waits for the UI to settle before re-rendering
+let liveSource = null; // EventSource of /api/live/events while Live mode shows sectors
+let loadedLiveVersion = null; // generation (X-Live-Version) of the sectors drawn
+let loadedLabelStyle = null;
+let polygonByRow = new Map(); // row id -> sector polygon, patched by Live mode diffs
+let pendingPopup = null; // search result waiting for its polygon to be loaded
+let hiddenBands = new Set(); // bands switched off in the layer control, kept across reloads
+let clearingLayers = false;
 let mapContainerEl;
 let mapEl;
 
@@ -37,6 +57,7 @@ const state = {
   bands: [],
   filterColumns: {},
   filterSelections: {},
+  profileName: "", // last profile loaded; its columns limit what the next upload loads
 };
 
 let appSessionId = null;
@@ -334,7 +355,8 @@ async function applyFilters() {
   const data = await res.json();
   renderPreview(data.preview || []);
   document.getElementById("row-count").textContent = data.total_rows ?? 0;
-  refreshMap();
+  // Live mode: the server pushes the sectors the filters removed or brought back
+  if (!liveSource) refreshMap();
 }
 
 function clearFilters() {
@@ -436,11 +458,19 @@ function initMap() {
   osm.addTo(map);
   baseLayers = { OpenStreetMap: osm, Satellite: satellite };
   overlayControl = L.control.layers(baseLayers, {}).addTo(map);
+  sectorTiles = new SectorTileLayer();
+  overlayControl.addOverlay(sectorTiles, SECTOR_TILES_LABEL);
   labelLayer = L.layerGroup().addTo(map);
+  clusterLayer = L.layerGroup().addTo(map);
   customMarkerLayer = L.layerGroup().addTo(map);
 
   // Unified map click handler
   map.on("click", onMapClick);
+  map.on("moveend", onMapMoveEnd);
+  map.on("overlayadd", (e) => hiddenBands.delete(e.name));
+  map.on("overlayremove", (e) => {
+    if (!clearingLayers && e.layer !== sectorTiles) hiddenBands.add(e.name);
+  });
 }
 
 function syncMapSize() {
@@ -455,13 +485,100 @@ function syncMapSize() {
 }
 
 function clearLayers() {
+  clearingLayers = true;
   Object.values(bandLayers).forEach((layer) => map.removeLayer(layer));
+  clearingLayers = false;
   bandLayers = {};
   if (overlayControl) {
     map.removeControl(overlayControl);
     overlayControl = L.control.layers(baseLayers, {}).addTo(map);
+    overlayControl.addOverlay(sectorTiles, SECTOR_TILES_LABEL);
   }
   labelLayer.clearLayers();
+  clusterLayer.clearLayers();
+}
+
+function createClusterMarker(cluster) {
+  const size = Math.round(28 + 8 * Math.log10(cluster.count));
+  const icon = L.divIcon({
+    className: "cell-cluster",
+    html: `<div style="background:${cluster.color}; width:${size}px; height:${size}px; line-height:${size}px;">${cluster.count}</div>`,
+    iconSize: [size, size],
+    iconAnchor: [size / 2, size / 2],
+  });
+  const marker = L.marker([cluster.lat, cluster.lon], { icon });
+  const mix = cluster.bands
+    .map((band) => `<span class="band-swatch" style="background:${band.color}"></span> ${band.label}: ${band.count}`)
+    .join("<br/>");
+  marker.bindTooltip(`<b>${cluster.count} sectors</b><br/>${mix}`, { direction: "top" });
+  marker.on("click", () => map.setView([cluster.lat, cluster.lon], Math.min(map.getZoom() + 2, map.getMaxZoom())));
+  return marker;
+}
+
+// Server-rendered tiles: the GeoJSON of /api/tiles/{z}/{x}/{y} drawn on a canvas per tile.
+// Petals come in every tile they touch (the canvas clips them), clusters in the tile of their centroid
+const SectorTileLayer = L.GridLayer.extend({
+  version: null, // map generation the tiles were drawn for, so a change refetches them
+
+  createTile(coords, done) {
+    const tile = L.DomUtil.create("canvas", "sector-tile");
+    const size = this.getTileSize();
+    tile.width = size.x;
+    tile.height = size.y;
+    fetch(`/api/tiles/${coords.z}/${coords.x}/${coords.y}?v=${this.version}`)
+      .then((res) => (res.ok ? res.json() : { features: [] }))
+      .then((collection) => {
+        drawSectorTile(tile, coords, size, collection.features);
+        done(null, tile);
+      })
+      .catch((error) => done(error, tile));
+    return tile;
+  },
+});
+
+function drawSectorTile(canvas, coords, size, features) {
+  const ctx = canvas.getContext("2d");
+  const origin = L.point(coords.x * size.x, coords.y * size.y);
+  const toPixel = (lon, lat) => map.project([lat, lon], coords.z).subtract(origin);
+  features.forEach((feature) => {
+    const { geometry, properties } = feature;
+    ctx.fillStyle = properties.color;
+    ctx.strokeStyle = properties.color;
+    if (geometry.type === "Point") {
+      const center = toPixel(...geometry.coordinates);
+      const radius = Math.round(14 + 4 * Math.log10(properties.count));
+      ctx.globalAlpha = 0.8;
+      ctx.beginPath();
+      ctx.arc(center.x, center.y, radius, 0, 2 * Math.PI);
+      ctx.fill();
+      ctx.globalAlpha = 1;
+      ctx.fillStyle = "#ffffff";
+      ctx.font = "bold 11px sans-serif";
+      ctx.textAlign = "center";
+      ctx.textBaseline = "middle";
+      ctx.fillText(String(properties.count), center.x, center.y);
+      return;
+    }
+    ctx.beginPath();
+    geometry.coordinates[0].forEach(([lon, lat], i) => {
+      const point = toPixel(lon, lat);
+      if (i === 0) ctx.moveTo(point.x, point.y);
+      else ctx.lineTo(point.x, point.y);
+    });
+    ctx.closePath();
+    ctx.globalAlpha = 0.6;
+    ctx.fill();
+    ctx.globalAlpha = 1;
+    ctx.lineWidth = 1;
+    ctx.stroke();
+  });
+}
+
+// Redraw the sector tiles once the drawn map data moved to a new generation
+function syncSectorTiles() {
+  if (sectorTiles.version === loadedLiveVersion) return;
+  sectorTiles.version = loadedLiveVersion;
+  if (map.hasLayer(sectorTiles)) sectorTiles.redraw();
 }
 
 function createLabelIcon(label, style) {
@@ -479,68 +596,383 @@ async function refreshMap() {
   setStatus("Rendering map...");
   try {
     await applyConfig();
-    const res = await fetch("/api/map-data");
-    if (!res.ok) {
-      setStatus("Error: Map data not available. Ensure mapping is complete.");
+    await loadMapData();
+  } catch (error) {
+    console.error("Map error:", error);
+    setStatus("Map error - check console");
+  }
+}
+
+// Live mode: coalesce bursts of changes (e.g. dragging the scale slider) into one refresh.
+// With sectors drawn, posting the config is enough: the changes arrive through liveSource
+function scheduleLiveRefresh() {
+  if (!autoRefreshEnabled) return;
+  clearTimeout(liveRefreshTimer);
+  liveRefreshTimer = setTimeout(() => {
+    if (!liveSource) {
+      refreshMap();
       return;
     }
-    const data = await res.json();
-    clearLayers();
-    polygonIndex = {};
-    siteIndex = {};
-
-    const bounds = [];
-    data.cells.forEach((cell) => {
-      if (!bandLayers[cell.band_label]) {
-        bandLayers[cell.band_label] = L.layerGroup().addTo(map);
-        overlayControl.addOverlay(bandLayers[cell.band_label], cell.band_label);
-      }
-    const polygon = L.polygon(cell.polygon, {
-      color: cell.color,
-      fillColor: cell.color,
-      fillOpacity: 0.6,
-      weight: 1,
-    });
-    polygon.bindPopup(cell.popup);
+    applyConfig().catch((error) => console.error("Config error:", error));
+  }, LIVE_REFRESH_DELAY_MS);
+}
+
+function connectLive() {
+  if (!autoRefreshEnabled || loadedClustered || !loadedBounds || loadedLiveVersion === null) {
+    disconnectLive();
+    return;
+  }
+  const params = new URLSearchParams({ since: loadedLiveVersion, bbox: loadedBounds.toBBoxString() });
+  const url = `/api/live/events?${params}`;
+  if (liveSource && liveSource.key === url) return;
+  disconnectLive();
+  liveSource = new EventSource(url);
+  liveSource.key = url;
+  liveSource.onmessage = (e) => applyLiveDiff(JSON.parse(e.data));
+}
+
+function disconnectLive() {
+  if (liveSource) {
+    liveSource.close();
+    liveSource = null;
+  }
+}
+
+// Patch the drawn sectors in place: removed rows go away, changed and added rows
+// are redrawn from their compact columns. A reload message fetches everything again
+function applyLiveDiff(diff) {
+  if (!mapDataLoaded || diff.version <= loadedLiveVersion) return; // e.g. replayed after a reconnect
+  if (mapRequestAbort) {
+    // A new view is loading; once drawn it resubscribes from its own generation
+    disconnectLive();
+    return;
+  }
+  if (diff.reload) {
+    disconnectLive();
+    loadMapData().catch((error) => console.error("Map error:", error));
+    return;
+  }
+  loadedLiveVersion = diff.version;
+  loadedEtag = null;
+  syncSectorTiles();
+  diff.removed.forEach(removeCellPolygon);
+  forEachCompactCell(diff.compact, (cell) => {
+    const polygon = polygonByRow.get(cell.row_id);
+    if (polygon) {
+      updateCellPolygon(polygon, cell);
+    } else {
+      addCellPolygon(cell);
+    }
+  });
+  if (diff.sites) {
+    labelLayer.clearLayers();
+    addSiteLabels(diff.sites, loadedLabelStyle);
+  }
+  setStatus(`Map updated (${diff.compact.count} sectors redrawn, ${diff.removed.length} removed)`);
+}
+
+function onMapMoveEnd() {
+  if (!mapDataLoaded) return;
+  // Panning inside the area already fetched (view + margin) needs no request
+  const sameZoom = !loadedClustered || map.getZoom() === loadedZoom;
+  if (sameZoom && loadedBounds && loadedBounds.contains(map.getBounds())) return;
+  loadMapData().catch((error) => console.error("Map error:", error));
+}
+
+function bandLayer(label) {
+  if (!bandLayers[label]) {
+    bandLayers[label] = L.layerGroup();
+    if (!hiddenBands.has(label)) {
+      bandLayers[label].addTo(map);
+    }
+    overlayControl.addOverlay(bandLayers[label], label);
+  }
+  return bandLayers[label];
+}
+
+function addCellPolygon(cell) {
+  const polygon = L.polygon(cell.polygon, {
+    color: cell.color,
+    fillColor: cell.color,
+    fillOpacity: 0.6,
+    weight: 1,
+  });
+  polygon.rowId = cell.row_id;
+  polygon.cell = cell;
+  polygon.bindPopup("Loading...");
+  polygon.on("popupopen", loadCellPopup);
+  if (cell.cell_label) {
+    polygon.bindTooltip(cell.cell_label, { direction: "top", sticky: true });
+  }
+  polygon.on("click", (e) => {
+    const { lat, lon, site_name: siteName, cell_name: cellName } = polygon.cell;
+    if (measureMode) {
+      L.DomEvent.stopPropagation(e);
+      addMeasurePoint(lat, lon, siteName || cellName);
+    } else if (addMarkerMode) {
+      L.DomEvent.stopPropagation(e);
+      onMapClickAddMarker({ latlng: { lat, lng: lon } }, siteName || cellName);
+    }
+  });
+  polygon.addTo(bandLayer(cell.band_label));
+  polygonByRow.set(cell.row_id, polygon);
+  if (cell.cell_name) {
+    polygonIndex[cell.cell_name] = polygon;
+  }
+  if (cell.site_name && !siteIndex[cell.site_name]) {
+    siteIndex[cell.site_name] = polygon;
+  }
+}
+
+function updateCellPolygon(polygon, cell) {
+  const previous = polygon.cell;
+  polygon.cell = cell;
+  polygon.setLatLngs(cell.polygon);
+  polygon.setStyle({ color: cell.color, fillColor: cell.color });
+  if (previous.band_label !== cell.band_label) {
+    bandLayers[previous.band_label].removeLayer(polygon);
+    bandLayer(cell.band_label).addLayer(polygon);
+  }
+  if (previous.cell_label !== cell.cell_label) {
+    polygon.unbindTooltip();
     if (cell.cell_label) {
       polygon.bindTooltip(cell.cell_label, { direction: "top", sticky: true });
     }
-    polygon.on("click", (e) => {
-      if (measureMode) {
-        L.DomEvent.stopPropagation(e);
-        addMeasurePoint(cell.lat, cell.lon, cell.site_name || cell.cell_name);
-      } else if (addMarkerMode) {
-        L.DomEvent.stopPropagation(e);
-        onMapClickAddMarker({ latlng: { lat: cell.lat, lng: cell.lon } }, cell.site_name || cell.cell_name);
-      }
-    });
-      polygon.addTo(bandLayers[cell.band_label]);
-      if (cell.cell_name) {
-        polygonIndex[cell.cell_name] = polygon;
-      }
-      if (cell.site_name && !siteIndex[cell.site_name]) {
-        siteIndex[cell.site_name] = polygon;
-      }
-      bounds.push([cell.lat, cell.lon]);
+  }
+}
+
+function removeCellPolygon(rowId) {
+  const polygon = polygonByRow.get(rowId);
+  if (!polygon) return;
+  polygonByRow.delete(rowId);
+  bandLayers[polygon.cell.band_label].removeLayer(polygon);
+  if (polygonIndex[polygon.cell.cell_name] === polygon) delete polygonIndex[polygon.cell.cell_name];
+  if (siteIndex[polygon.cell.site_name] === polygon) delete siteIndex[polygon.cell.site_name];
+}
+
+// Popup HTML is fetched from /api/cell/{row_id} the first time a sector is opened
+async function loadCellPopup(e) {
+  const polygon = e.target;
+  if (polygon.popupLoaded) return;
+  polygon.popupLoaded = true;
+  try {
+    const res = await fetch(`/api/cell/${polygon.rowId}`);
+    if (!res.ok) throw new Error(`HTTP ${res.status}`);
+    const data = await res.json();
+    polygon.setPopupContent(data.popup);
+  } catch (error) {
+    polygon.popupLoaded = false;
+    polygon.setPopupContent("Sector details not available");
+  }
+}
+
+// Compact map data: sector parameters as columns, petals drawn here with generatePetalJS
+function forEachCompactCell(columns, callback) {
+  for (let i = 0; i < columns.count; i += 1) {
+    const band = columns.bands[columns.band[i]];
+    const lat = columns.lat[i];
+    const lon = columns.lon[i];
+    callback({
+      cell_name: columns.cell_name[i],
+      site_name: columns.site_name[i],
+      lat,
+      lon,
+      band_key: band.key,
+      band_label: band.label,
+      color: band.color,
+      polygon: generatePetalJS(lat, lon, columns.azimuth[i], columns.beamwidth[i], columns.radius[i]),
+      row_id: columns.row_id[i],
+      cell_label: columns.cell_label[i],
     });
+  }
+}
 
-    if (data.label_config.show_label) {
-      data.sites.forEach((site) => {
-        const icon = createLabelIcon(site.label, data.label_config);
-        const marker = L.marker([site.lat, site.lon], { icon, interactive: false });
-        marker.addTo(labelLayer);
-      });
+function addSiteLabels(sites, style) {
+  if (!style.show_label) return;
+  sites.forEach((site) => {
+    const icon = createLabelIcon(site.label, style);
+    const marker = L.marker([site.lat, site.lon], { icon, interactive: false });
+    marker.addTo(labelLayer);
+  });
+}
+
+// Streamed map data is newline-delimited JSON; onLine gets each line as soon as it
+// arrives and stops the download by returning false
+async function readJsonLines(res, onLine) {
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = "";
+  for (;;) {
+    const { done, value } = await reader.read();
+    buffered += decoder.decode(value || new Uint8Array(), { stream: !done });
+    const lines = buffered.split("\n");
+    buffered = lines.pop();
+    for (const line of lines) {
+      if (line && (await onLine(JSON.parse(line))) === false) {
+        reader.cancel();
+        return;
+      }
     }
+    if (done) return;
+  }
+}
+
+const MAP_BINARY_TYPE = "application/x-mob-columns";
+const MAP_BINARY_STREAM_TYPE = "application/x-mob-column-frames";
+const COLUMN_ARRAYS = {
+  float64: Float64Array,
+  float32: Float32Array,
+  uint16: Uint16Array,
+  int32: Int32Array,
+};
 
-    if (bounds.length > 0) {
-      map.fitBounds(bounds, { padding: [30, 30] });
+// Binary map data: "MOBC", uint32 header length, JSON header, then 8-byte aligned
+// little-endian column buffers that are wrapped as typed arrays without parsing
+function decodeMapColumns(buffer) {
+  const view = new DataView(buffer);
+  const magic = String.fromCharCode(view.getUint8(0), view.getUint8(1), view.getUint8(2), view.getUint8(3));
+  if (magic !== "MOBC") throw new Error("Unexpected map data format");
+  const headerLength = view.getUint32(4, true);
+  const data = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength)));
+  const start = 8 + headerLength;
+  (data.buffers || []).forEach((column) => {
+    data.compact[column.name] = new COLUMN_ARRAYS[column.dtype](buffer, start + column.offset, column.length);
+  });
+  return data;
+}
+
+// Streamed binary map data: the messages of the NDJSON stream as binary records, each
+// prefixed by its uint32 LE length; onMessage is called as readJsonLines calls onLine
+async function readColumnFrames(res, onMessage) {
+  const reader = res.body.getReader();
+  let buffered = new Uint8Array(0);
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (value) {
+      const joined = new Uint8Array(buffered.length + value.length);
+      joined.set(buffered);
+      joined.set(value, buffered.length);
+      buffered = joined;
     }
+    let offset = 0;
+    while (buffered.length - offset >= 4) {
+      const length = new DataView(buffered.buffer, buffered.byteOffset + offset, 4).getUint32(0, true);
+      if (buffered.length - offset - 4 < length) break;
+      // Copied out so the column buffers start aligned
+      const record = buffered.slice(offset + 4, offset + 4 + length).buffer;
+      offset += 4 + length;
+      if ((await onMessage(decodeMapColumns(record))) === false) {
+        reader.cancel();
+        return;
+      }
+    }
+    buffered = buffered.subarray(offset);
+    if (done) return;
+  }
+}
 
-    syncMapSize();
-    setStatus(`Map ready (${data.cells.length} sectors)`);
+async function loadMapData() {
+  const seq = ++mapRequestSeq;
+  // A newer view or config replaces the request in flight
+  if (mapRequestAbort) mapRequestAbort.abort();
+  const controller = new AbortController();
+  mapRequestAbort = controller;
+  try {
+    await fetchMapData(seq, controller.signal);
   } catch (error) {
-    console.error("Map error:", error);
-    setStatus("Map error - check console");
+    if (error.name !== "AbortError") throw error;
+  } finally {
+    if (mapRequestAbort === controller) mapRequestAbort = null;
+  }
+}
+
+async function fetchMapData(seq, signal) {
+  const params = new URLSearchParams({ bbox: map.getBounds().toBBoxString(), zoom: map.getZoom(), stream: true });
+  const res = await fetch(`/api/map-data?${params}`, {
+    headers: { Accept: `${MAP_BINARY_TYPE}, application/x-ndjson` },
+    signal,
+  });
+  if (seq !== mapRequestSeq) return;
+  // 409: the server dropped this render for a newer configuration, whose request follows
+  if (res.status === 409) return;
+  if (!res.ok) {
+    setStatus("Error: Map data not available. Ensure mapping is complete.");
+    return;
+  }
+  // Same data, settings and view as what is drawn (e.g. Live mode with no effective change)
+  const etag = res.headers.get("ETag");
+  const liveVersion = Number(res.headers.get("X-Live-Version"));
+  if (etag && etag === loadedEtag) {
+    res.body.cancel();
+    loadedLiveVersion = liveVersion;
+    syncSectorTiles();
+    connectLive();
+    setStatus("Map ready (no changes)");
+    openPendingPopup();
+    return;
+  }
+
+  // First message: view metadata (and clusters); then one batch of sectors of one band per message
+  const binary = (res.headers.get("content-type") || "").startsWith(MAP_BINARY_STREAM_TYPE);
+  let data = null;
+  let loaded = 0;
+  await (binary ? readColumnFrames : readJsonLines)(res, async (line) => {
+    if (seq !== mapRequestSeq) return false;
+    if (!data) {
+      data = line;
+      loadedEtag = null;
+      clearLayers();
+      polygonIndex = {};
+      siteIndex = {};
+      polygonByRow = new Map();
+      loadedLabelStyle = data.label_config;
+      (data.clusters || []).forEach((cluster) => createClusterMarker(cluster).addTo(clusterLayer));
+      return true;
+    }
+    if (line.compact) {
+      forEachCompactCell(line.compact, addCellPolygon);
+      addSiteLabels(line.sites, data.label_config);
+      loaded += line.compact.count;
+      setStatus(`Rendering map... (${loaded} of ${data.count} sectors)`);
+      // Let the browser paint this batch before drawing the next one
+      await new Promise((resolve) => setTimeout(resolve, 0));
+    }
+    return true;
+  });
+  if (seq !== mapRequestSeq || !data) return;
+
+  mapDataLoaded = true;
+  loadedEtag = etag;
+  loadedZoom = data.zoom;
+  loadedClustered = Boolean(data.clusters);
+  loadedBounds = data.bbox ? L.latLngBounds([data.bbox[1], data.bbox[0]], [data.bbox[3], data.bbox[2]]) : null;
+  loadedLiveVersion = liveVersion;
+  syncSectorTiles();
+  connectLive();
+  syncMapSize();
+  if (data.clusters) {
+    setStatus(`Map ready (${data.total} sectors, ${data.clusters.length} clusters in view - zoom in for sectors)`);
+  } else {
+    setStatus(`Map ready (${loaded} of ${data.total} sectors in view)`);
+  }
+
+  // New dataset (upload, filters, mapping): frame it; the resulting moveend loads the new view
+  const boundsKey = JSON.stringify(data.bounds);
+  if (data.bounds && boundsKey !== dataBoundsKey) {
+    dataBoundsKey = boundsKey;
+    map.fitBounds(data.bounds, { padding: [30, 30] });
+    return;
+  }
+  openPendingPopup();
+}
+
+function openPendingPopup() {
+  if (!pendingPopup) return;
+  const polygon = (pendingPopup.cellName && polygonIndex[pendingPopup.cellName]) ||
+    (pendingPopup.siteName && siteIndex[pendingPopup.siteName]);
+  pendingPopup = null;
+  if (polygon) {
+    polygon.openPopup();
   }
 }
 
@@ -618,22 +1050,76 @@ function selectSearchResult(cellName, siteName, lat, lon, kind) {
     searchResults.classList.remove("show");
   }
 
+  if (kind !== "city") {
+    // The target may be outside the area loaded so far; open it once the new view arrives
+    pendingPopup = { cellName, siteName };
+  }
+
   if (map && !Number.isNaN(lat) && !Number.isNaN(lon)) {
     map.setView([lat, lon], kind === "city" ? 11 : 16);
   }
 
   if (kind !== "city") {
     const polygon = (cellName && polygonIndex[cellName]) || (siteName && siteIndex[siteName]);
-    if (polygon) {
+    if (polygon && loadedBounds && loadedBounds.contains(map.getBounds())) {
+      pendingPopup = null;
       polygon.openPopup();
     }
   }
 }
 
+const INGEST_PROGRESS_INTERVAL_MS = 300;
+
+function formatMegabytes(bytes) {
+  return `${(bytes / (1024 * 1024)).toFixed(1)} MB`;
+}
+
+// The file goes as the raw request body, which the server writes to disk as it arrives.
+// XMLHttpRequest rather than fetch because it reports upload progress
+function postFile(url, file, onProgress) {
+  return new Promise((resolve, reject) => {
+    const xhr = new XMLHttpRequest();
+    xhr.open("POST", url);
+    xhr.setRequestHeader("Content-Type", "application/octet-stream");
+    xhr.responseType = "json";
+    xhr.upload.onprogress = (e) => {
+      if (e.lengthComputable) onProgress(e.loaded, e.total);
+    };
+    xhr.onload = () => resolve({ ok: xhr.status >= 200 && xhr.status < 300, status: xhr.status, data: xhr.response });
+    xhr.onerror = () => reject(new Error("Upload failed"));
+    xhr.send(file);
+  });
+}
+
+async function clearIngestCache() {
+  try {
+    const res = await fetch("/api/ingest-cache", { method: "DELETE" });
+    const data = await res.json();
+    setUploadInlineStatus(`File cache cleared (${data.removed} files)`, "success");
+  } catch (error) {
+    console.error("Cache error:", error);
+    setUploadInlineStatus("Could not clear the file cache", "error");
+  }
+}
+
+// Rows parsed so far, while the server reads the uploaded file
+async function showIngestProgress() {
+  try {
+    const res = await fetch("/api/upload/progress");
+    const progress = await res.json();
+    if (progress.status !== "parsing" || !progress.bytes_total) return;
+    const percent = Math.floor((100 * progress.bytes_read) / progress.bytes_total);
+    setUploadInlineStatus(`Reading file... ${percent}% (${progress.rows.toLocaleString()} rows)`, "muted", true);
+  } catch (error) {
+    // Progress is informative only
+  }
+}
+
 async function uploadFile() {
   const fileInput = document.getElementById("file-input");
   const browseBtn = document.getElementById("btn-browse");
   const uploadBtn = document.getElementById("btn-upload");
+  const sheetSelect = document.getElementById("sheet-select");
 
   if (!fileInput.files.length) {
     setUploadInlineStatus("Select a file first", "error");
@@ -643,16 +1129,29 @@ async function uploadFile() {
   uploadBtn.disabled = true;
   browseBtn.disabled = true;
   fileInput.disabled = true;
+  sheetSelect.disabled = true;
 
-  const formData = new FormData();
-  formData.append("file", fileInput.files[0]);
-
+  const file = fileInput.files[0];
+  const params = new URLSearchParams({ filename: file.name });
+  if (state.profileName) params.set("profile", state.profileName);
+  if (!sheetSelect.hidden && sheetSelect.value) params.set("sheet", sheetSelect.value);
+  let progressTimer = null;
   try {
     setStatus("Uploading...");
     setUploadInlineStatus("Uploading...", "muted", true);
 
-    const res = await fetch("/api/upload", { method: "POST", body: formData });
-    const data = await res.json();
+    const res = await postFile(`/api/upload?${params}`, file, (loaded, total) => {
+      if (loaded < total) {
+        const percent = Math.floor((100 * loaded) / total);
+        setUploadInlineStatus(`Uploading... ${percent}% (${formatMegabytes(loaded)} of ${formatMegabytes(total)})`, "muted", true);
+      } else if (!progressTimer) {
+        setStatus("Reading file...");
+        setUploadInlineStatus("Reading file...", "muted", true);
+        progressTimer = setInterval(showIngestProgress, INGEST_PROGRESS_INTERVAL_MS);
+      }
+    });
+    clearInterval(progressTimer);
+    const data = res.data;
     if (!res.ok) {
       const errorMsg = data?.detail || "Upload error";
       setStatus("Upload error");
@@ -670,9 +1169,16 @@ async function uploadFile() {
     buildExtraFields(state.columns);
     buildLabelSelectors(state.columns);
     await buildFilterFields(state.filterColumns);
+    buildSheetSelect(data.meta?.sheet_names || [], params.get("sheet"));
     setStatus("Data loaded");
-    setUploadInlineStatus("Upload complete", "success");
+    const skipped = data.meta?.skipped_columns || [];
+    const notes = [];
+    if (data.meta?.cached) notes.push("from file cache");
+    if (skipped.length) notes.push(`${skipped.length} columns not used by the profile skipped`);
+    if (data.meta?.memory) notes.push(`${formatMegabytes(data.meta.memory.bytes)} in memory`);
+    setUploadInlineStatus(notes.length ? `Upload complete (${notes.join(", ")})` : "Upload complete", "success");
   } catch (error) {
+    clearInterval(progressTimer);
     console.error("Upload error:", error);
     setStatus("Upload error");
     setUploadInlineStatus("Upload failed", "error");
@@ -680,9 +1186,21 @@ async function uploadFile() {
     uploadBtn.disabled = false;
     browseBtn.disabled = false;
     fileInput.disabled = false;
+    sheetSelect.disabled = false;
   }
 }
 
+function buildSheetSelect(sheetNames, selected) {
+  // Only workbooks with several sheets offer a choice; picking one uploads the file again
+  const select = document.getElementById("sheet-select");
+  select.innerHTML = "";
+  select.hidden = sheetNames.length < 2;
+  if (select.hidden) return;
+  sheetNames.forEach((name) => select.appendChild(new Option(name, name)));
+  select.appendChild(new Option("All sheets", "*"));
+  select.value = selected || sheetNames[0];
+}
+
 async function autoMap() {
   updateMappingFromUI();
   const res = await fetch("/api/auto-map", { method: "POST" });
@@ -733,6 +1251,50 @@ async function downloadFile(endpoint, filename) {
   window.URL.revokeObjectURL(url);
 }
 
+// KML exports run as background jobs: progress arrives over Server-Sent Events and
+// the finished file is downloaded from the job
+async function downloadKml() {
+  const output = document.getElementById("kml-output").value;
+  const compression = Number(document.getElementById("kmz-compression").value);
+  await applyConfig();
+  const res = await fetch("/api/jobs/kml", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ output, compression }),
+  });
+  if (!res.ok) {
+    setStatus("Error: KML export failed. Ensure mapping is complete.");
+    return;
+  }
+  const job = await res.json();
+  const label = output.toUpperCase();
+  const events = new EventSource(`/api/jobs/${job.id}/events`);
+  events.onmessage = (e) => {
+    const state = JSON.parse(e.data);
+    if (state.status === "queued" || state.status === "running") {
+      const eta = state.eta_seconds !== null ? ` - about ${Math.ceil(state.eta_seconds)}s left` : "";
+      setStatus(`Generating ${label}... ${Math.floor(state.progress * 100)}%${eta}`);
+      return;
+    }
+    events.close();
+    if (state.status !== "done") {
+      setStatus(`${label} export ${state.status}${state.error ? `: ${state.error}` : ""}`);
+      return;
+    }
+    setStatus(`${label} ready (${state.rows_total} sectors)`);
+    const a = document.createElement("a");
+    a.href = state.download_url;
+    a.download = state.filename;
+    document.body.appendChild(a);
+    a.click();
+    a.remove();
+  };
+  events.onerror = () => {
+    events.close();
+    setStatus(`${label} export: connection lost`);
+  };
+}
+
 async function loadProfiles() {
   const res = await fetch("/api/profiles");
   const data = await res.json();
@@ -768,6 +1330,7 @@ async function loadProfile() {
   });
   const data = await res.json();
   const profile = data.data || {};
+  state.profileName = name;
 
   if (profile.mapping) {
     updateMappingUI(profile.mapping);
@@ -991,9 +1554,12 @@ function wireEvents() {
   document.getElementById("file-input").addEventListener("change", (e) => {
     const name = e.target.files.length > 0 ? e.target.files[0].name : "No file selected";
     document.getElementById("file-name-display").textContent = name;
+    buildSheetSelect([]);
   });
+  document.getElementById("sheet-select").addEventListener("change", uploadFile);
 
   document.getElementById("btn-upload").addEventListener("click", uploadFile);
+  document.getElementById("btn-clear-ingest-cache").addEventListener("click", clearIngestCache);
   document.getElementById("btn-auto-map").addEventListener("click", autoMap);
   document.getElementById("btn-validate-map").addEventListener("click", validateMapping);
   document.getElementById("btn-refresh-map").addEventListener("click", refreshMap);
@@ -1002,22 +1568,20 @@ function wireEvents() {
   document.getElementById("btn-add-marker").addEventListener("click", toggleAddMarkerMode);
   document.getElementById("btn-apply-filters").addEventListener("click", applyFilters);
   document.getElementById("btn-clear-filters").addEventListener("click", clearFilters);
-  document.getElementById("btn-generate-kml").addEventListener("click", () => downloadFile("/api/generate-kml", "cells.kml"));
-  document.getElementById("btn-download-kml").addEventListener("click", () => downloadFile("/api/generate-kml", "cells.kml"));
+  document.getElementById("btn-generate-kml").addEventListener("click", downloadKml);
+  document.getElementById("btn-download-kml").addEventListener("click", downloadKml);
   document.getElementById("btn-export-report").addEventListener("click", () => downloadFile("/api/export-report", "report.txt"));
   document.getElementById("btn-save-profile").addEventListener("click", saveProfile);
   document.getElementById("btn-load-profile").addEventListener("click", loadProfile);
 
   document.getElementById("scale-range").addEventListener("input", (e) => {
     document.getElementById("scale-value").textContent = e.target.value;
-    if (autoRefreshEnabled) refreshMap();
+    scheduleLiveRefresh();
   });
 
   // Auto-refresh map on config changes
   document.querySelectorAll("[data-map], [data-radius], [data-beam], #extra-fields input[type='checkbox'], #site-label-field, #cell-label-field, #label-show, #label-shadow, #label-use-site, #label-hide-cell, #label-scale, #label-color, #label-position, #label-template").forEach((el) => {
-    el.addEventListener("change", () => {
-      if (autoRefreshEnabled) refreshMap();
-    });
+    el.addEventListener("change", scheduleLiveRefresh);
   });
 }
 
@@ -1033,6 +1597,7 @@ function toggleAutoRefresh() {
     btn.classList.remove("btn-primary");
     btn.classList.add("btn-outline-light");
     btn.textContent = "🔄 Live";
+    disconnectLive();
   }
 }
 